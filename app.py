@@ -1,285 +1,119 @@
 # IMPORTS
-import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
-from flask.globals import session
-from flask_moment import Moment
+import gc
 import logging
 from logging import Formatter, FileHandler
-from forms import *
-from models import *
-
-
-# APP CONFIG
-app = Flask(__name__)
-app.config.from_object('config')
-
-db.init_app(app)
-migrate.init_app(app, db)
-
-moment = Moment(app)
-
-
-# FILTERS
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
-
-app.jinja_env.filters['datetime'] = format_datetime
-
-
-# CONTROLLERS
-
-""" HOME PAGE """
-
-@app.route('/')
-def index():
-    return render_template('pages/home.html')
-
-
-""" VENUES """
-
-# CREATE
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-    """Returns a form to the user for adding a new venue"""
-    form = VenueForm()
-    return render_template('forms/new_venue.html', form=form)
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-    """ Called upon submitting the new artist listing form """
-    # Get the data
-    form = VenueForm(request.form,  meta={'csrf': False})
-    form_data = form.data
-    form_data.update({"seeking_talent": bool(form_data['seeking_talent'])})
-
-    # Create the venue
-    created = Venue.create(form_data)
-    
-    # Update the user 
-    if created:
-        flash('Venue listed successfully!')
-    else: 
-        flash('Sorry, an error occurred.')
-
-    return render_template('pages/home.html')
-
-# READ
-@app.route('/venues')
-def venues():
-    """List venues grouped by area (city, state)"""
-    data = Venue.group_by_area()
-    return render_template('pages/venues.html', areas=data)
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-    """Search venues"""
-    search_term = request.form.get('search_term', '')
-    response = Venue.search(search_term)
-    return render_template('pages/search_venues.html', results=response, search_term=search_term)
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    """Show the venue details page"""
-    venue = Venue.query.get(venue_id)
-    return render_template('pages/show_venue.html', venue=venue.serialize())
-
-# UPDATE
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-    """Returns form populated with the artist data"""
-    form = VenueForm()
-    venue = Venue.query.get(venue_id)
-    return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-    """Edit a venue using it's id"""
-    # Get form data
-    form = VenueForm(request.form, meta={'csrf': False})
-    form_data = form.data
-
-    # Get the venue
-    venue = Venue.query.get(venue_id)  
-
-    # Update the venue
-    updated = venue.update(**form_data)
-    
-    if updated:
-        flash('Venue updatdeded successfully!')
-        return redirect(url_for('show_venue', venue_id=venue_id))
-    else: 
-        flash('Sorry, an error occurred.')
-        return redirect(url_for('edit_venue', venue_id=venue_id))
-
-
-# DELETE
-@app.route('/venues/<venue_id>/delete', methods=['GET'])
-def delete_venue(venue_id):
-    """Delete a venue using it's id"""
-    venue = Venue.query.get(venue_id)
-    print('del invoked')
-    deleted = venue.delete()
-    print(deleted)
-    if deleted:
-        flash('Venue deleted successfully!')
-    else: 
-        flash('Sorry, an error occurred.')
-
-    return redirect(url_for('venues'))
-
-
-
-""" Artists """
-
-# CREATE
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-    """Returns a form to the user for adding a new Artist"""
-    form = ArtistForm()
-    return render_template('forms/new_artist.html', form=form)
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():  
-    """ Called upon submitting the new artist listing form """
-    # Get the data
-    form = ArtistForm(request.form, csrf_enabled=False)
-    form_data = form.data
-    form_data.update({'seeking_venue': bool(form_data['seeking_venue'])})
-    
-    # Create the venue
-    created = Artist.create(form_data)
-    
-    # Update the user 
-    if created:
-        flash('Artist listed successfully!')
-    else: 
-        flash('Sorry, an error occurred.')
-
-    return render_template('pages/home.html')
-
-# READ
-@app.route('/artists')
-def artists():
-    artists = Artist.query.all() 
-    data = [{'id': artist.id, 'name': artist.name} for artist in artists]
-    return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-    """Search Artists"""
-    search_term = request.form.get('search_term', '')
-    response = Artist.search(search_term)
-    return render_template('pages/search_venues.html', results=response, search_term=search_term)
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-    """Show the venue details page"""
-    artist = Artist.query.get(artist_id)
-    return render_template('pages/show_artist.html', artist=artist.serialize())
-
-
-# UPDATE
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-    """Returns form populated with the artist data"""
-    form = ArtistForm()
-    artist = Artist.query.get(artist_id)
-    return render_template('forms/edit_artist.html', form=form, artist=artist)
-    
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id): 
-    """Edit a venue using it's id"""
-    # Get form data
-    form = ArtistForm(request.form, meta={'csrf': False})
-    form_data = form.data
-
-    # Get the artist
-    artist = Artist.query.get(artist_id)  
-
-    # Update the venue
-    updated = artist.update(**form_data)
-    
-    if updated:
-        flash('Artist updatdeded successfully!')
-        return redirect(url_for('show_artist', artist_id=artist_id))                       
-    else: 
-        flash('Sorry, an error occurred.')
-        return redirect(url_for(f'edit_artist', artist_id=artist_id))                       
-    
-
-
-""" SHOWS """
-
-# READ
-@app.route('/shows')
-def shows():                                                      #DONE
-  """ displays list of shows at /shows """
-  shows = Show.query.all()
-  data = [show.serialize() for show in shows]
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
-def create_shows():
-  """ renders form. do not touch """
-  form = ShowForm()
-  return render_template('forms/new_show.html', form=form)
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():                                      #DONE
-    """ called upon submitting the new artist listing form """
-
-    form = ShowForm(request.form, csrf_enabled=False)
-    form_data = form.data
- 
-    # Create the venue
-    created = Show.create(form_data)
-    
-    # Update the user 
-    if created:
-        flash('Show listed successfully!')
-    else: 
-        flash('Sorry, an error occurred.')
-
-    return render_template('pages/home.html')
-
-
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
-
+from flask import Flask
+from flask_moment import Moment
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+from models import db, migrate
+from assets import static_assets
+from cache import cache
+from conditional import conditional
+from fragments import fragment_cache
+from metrics import query_metrics
+from autocomplete import name_index
+from directory import area_directory
+from filters import format_datetime
+import commands
+
+moment = Moment()
+
+
+# APP FACTORY
+
+def create_app(config=None):
+    """Build the application.
+
+    Settings come from config.py, then from `config` (a dict or an import
+    path) when given. Forms, babel, dateutil and the bulk-data modules are
+    imported by the views that use them, so a worker starts without them;
+    preload() imports them once in a pre-forking master.
+
+    The extensions are module-level singletons (db aside) that keep the
+    settings of the last app they were initialized with: one app per
+    process. A second create_app() with another config also reconfigures
+    the cache, fragment_cache, conditional and name_index of the first.
+    """
+    app = Flask(__name__)
+    app.config.from_object('config')
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config:
+        app.config.from_object(config)
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    static_assets.init_app(app)
+    cache.init_app(app)
+    conditional.init_app(app)
+    fragment_cache.init_app(app)
+    query_metrics.init_app(app)
+    name_index.init_app(app)
+    area_directory.init_app(app)
+    moment.init_app(app)
+
+    app.jinja_env.filters['datetime'] = format_datetime
+
+    from blueprints import main, venues, artists, shows
+    for blueprint in (main.bp, venues.bp, artists.bp, shows.bp):
+        app.register_blueprint(blueprint)
+    app.register_error_handler(404, main.not_found_error)
+    app.register_error_handler(500, main.server_error)
+
+    commands.init_app(app)
+
+    if not app.debug and not app.testing and app.config.get('LOG_FILE'):
+        file_handler = FileHandler(app.config['LOG_FILE'])
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    return app
+
+
+def dispose_engines(app):
+    """Drop pooled connections, which must not be shared across a fork"""
+    with app.app_context():
+        db.get_engine(app).dispose()
+        for bind in app.config.get('SQLALCHEMY_BINDS') or {}:
+            db.get_engine(app, bind=bind).dispose()
+
+
+def preload(app):
+    """Warm `app` in a pre-forking master so workers share the pages copy-on-write.
+
+    Imports the lazily loaded modules, compiles every template and builds the
+    autocomplete index once, then freezes the heap so the garbage collector
+    does not touch (and so copy) the shared objects in each worker.
+    """
+    import babel.dates
+    import dateutil.parser
+    import forms
+    import exporter
+    import importer
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    with app.app_context():
+        name_index.ensure_built()
+    dispose_engines(app)
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
 
 
 # LAUNCH
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-'''
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=port)
+'''
@@ -0,0 +1,167 @@
+"""Fingerprinted, precompressed static assets.
+
+`flask build-assets` copies every file of static/ to static/build/ under a
+content-hashed name (css/main.css -> build/css/main.1a2b3c4d.css), writes gzip
+and brotli variants of the compressible ones and a manifest.json mapping the
+original names to the hashed ones. CSS url() references are rewritten to the
+hashed names too.
+
+At runtime url_for('static', filename='css/main.css') resolves through the
+manifest, and hashed files are served with the best encoding the client
+accepts and an immutable, year-long Cache-Control. Without a manifest (no
+build yet) static files are served as before.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+
+# Already compressed formats (images, woff) gain nothing from gzip/brotli
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.otf', '.ttf', '.eot', '.html'}
+# Preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+ONE_YEAR = 365 * 24 * 3600
+
+
+def fingerprint(name, content):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:8]}{ext}'
+
+
+def rewrite_css_urls(name, content, manifest):
+    """Point the url() references of the CSS file `name` at the hashed files"""
+    directory = posixpath.dirname(name)
+    hashed_directory = posixpath.join(BUILD_DIR, directory)
+
+    def replace(match):
+        quote, url = match.groups()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(directory, path))
+        # Unknown files keep pointing at their original location
+        target = manifest.get(target, target)
+        return f'url({quote}{posixpath.relpath(target, hashed_directory)}{suffix}{quote})'
+
+    return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+
+def compress(path, content):
+    """Write the .gz and .br variants of `path` that are smaller than the original"""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        variants['.br'] = brotli.compress(content, quality=11)
+    except ImportError:
+        pass
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+def build(static_folder, clean=False):
+    """Build static/build and its manifest; returns the manifest.
+
+    Files of earlier builds are kept unless `clean` is set: pages cached by
+    browsers may still reference them.
+    """
+    output = os.path.join(static_folder, BUILD_DIR)
+    if clean:
+        shutil.rmtree(output, ignore_errors=True)
+
+    names = []
+    for root, directories, files in os.walk(static_folder):
+        directories[:] = [d for d in directories if os.path.join(root, d) != output]
+        for file in files:
+            if not file.startswith('.'):
+                names.append(os.path.relpath(os.path.join(root, file), static_folder).replace(os.sep, '/'))
+    # CSS last, so the files it references already have their hashed names
+    names.sort(key=lambda name: (name.endswith('.css'), name))
+
+    manifest = {}
+    for name in names:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            content = f.read()
+        if name.endswith('.css'):
+            content = rewrite_css_urls(name, content, manifest)
+        hashed = posixpath.join(BUILD_DIR, fingerprint(name, content))
+        path = os.path.join(static_folder, hashed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for suffix in ('.gz', '.br'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        with open(path, 'wb') as f:
+            f.write(content)
+        if posixpath.splitext(name)[1].lower() in COMPRESSIBLE:
+            compress(path, content)
+        manifest[name] = hashed
+
+    with open(os.path.join(output, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class StaticAssets:
+    """Resolves static URLs through the build manifest and serves the hashed files"""
+
+    def __init__(self):
+        self.app = None
+        self.manifest = {}
+        self.hashed = set()
+
+    def init_app(self, app):
+        self.app = app
+        self.load()
+        app.url_defaults(self.hashed_url)
+        app.view_functions['static'] = self.send_static
+
+    def load(self):
+        try:
+            with open(os.path.join(self.app.static_folder, BUILD_DIR, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {}
+        self.hashed = set(self.manifest.values())
+
+    def hashed_url(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.manifest.get(values['filename'], values['filename'])
+
+    def send_static(self, filename):
+        if filename not in self.hashed:
+            return self.app.send_static_file(filename)
+        path = safe_join(self.app.static_folder, filename)
+        if path is None:
+            raise NotFound()
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = None
+        for encoding, suffix in ENCODINGS:
+            if encoding in request.accept_encodings and os.path.isfile(path + suffix):
+                response = send_file(path + suffix, mimetype=mimetype, conditional=True)
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = send_file(path, mimetype=mimetype, conditional=True)
+        response.vary.add('Accept-Encoding')
+        # The name changes whenever the content does
+        response.headers['Cache-Control'] = f'public, max-age={ONE_YEAR}, immutable'
+        return response
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,123 @@
+from bisect import bisect_left, insort
+from threading import Lock
+import time
+
+# Stop walking a very common prefix after this many index entries of one kind
+MAX_SCAN = 2000
+
+KINDS = ('venue', 'artist')
+
+
+def word_suffixes(name):
+    """Lower-cased name from each word onwards: 'The Musical Hop' -> 'the musical hop', 'musical hop', 'hop'"""
+    name = (name or '').lower()
+    words = name.split()
+    suffixes, start = [], 0
+    for word in words:
+        start = name.index(word, start)
+        suffixes.append(name[start:])
+        start += len(word)
+    return suffixes
+
+
+def data_version():
+    """Change markers of venue and artist names: latest update and latest deletion of each"""
+    from models import db, latest, last_deletion, Venue, Artist
+    return tuple(db.session.query(latest(Venue.updated_at), latest(Artist.updated_at),
+                                  last_deletion('venues'), last_deletion('artists')).one())
+
+
+class PrefixIndex:
+    """In-process sorted indexes of venue and artist names, queried with bisect.
+
+    Every word of a name is a match start, so 'hop' finds 'The Musical Hop'.
+    Built on the first request (or once in the master, before forking) and kept
+    current by the models' create/update/delete. Each worker process holds its
+    own copy, so writes handled by other workers (or the importer) are picked
+    up by ensure_current(), which rebuilds when the venue and artist change
+    markers have moved; it queries them at most every AUTOCOMPLETE_CHECK_INTERVAL
+    seconds.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.entries = {kind: [] for kind in KINDS}
+        self.names = {}
+        self.built = False
+        self.version = None
+        self.checked_at = 0
+        self.check_interval = 5
+
+    def init_app(self, app):
+        self.check_interval = app.config.get('AUTOCOMPLETE_CHECK_INTERVAL', 5)
+        app.before_first_request(self.ensure_built)
+
+    def ensure_built(self):
+        """Build unless a pre-forking master already did (see app.preload)"""
+        if not self.built:
+            self.build()
+
+    def ensure_current(self):
+        """Rebuild if venues or artists changed since the last build"""
+        now = time.monotonic()
+        if self.built and now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+        if not self.built or data_version() != self.version:
+            self.build()
+
+    def build(self):
+        from models import db, Venue, Artist
+        # Read first: a write landing during the build is seen by the next check
+        version = data_version()
+        entries, names = {kind: [] for kind in KINDS}, {}
+        for kind, model in (('venue', Venue), ('artist', Artist)):
+            for entity_id, name in db.session.query(model.id, model.name).yield_per(10000):
+                names[(kind, entity_id)] = name
+                entries[kind].extend((key, entity_id) for key in word_suffixes(name))
+            entries[kind].sort()
+        with self.lock:
+            self.entries, self.names, self.built, self.version = entries, names, True, version
+
+    def _remove(self, kind, entity_id):
+        name = self.names.pop((kind, entity_id), None)
+        entries = self.entries[kind]
+        for key in word_suffixes(name):
+            i = bisect_left(entries, (key, entity_id))
+            if i < len(entries) and entries[i] == (key, entity_id):
+                del entries[i]
+
+    def add(self, kind, entity_id, name):
+        """Index a new name, replacing the entity's previous one"""
+        with self.lock:
+            if not self.built:
+                return
+            self._remove(kind, entity_id)
+            self.names[(kind, entity_id)] = name
+            for key in word_suffixes(name):
+                insort(self.entries[kind], (key, entity_id))
+
+    def remove(self, kind, entity_id):
+        with self.lock:
+            self._remove(kind, entity_id)
+
+    def search(self, prefix, limit=10):
+        """Up to `limit` venues and `limit` artists whose name has a word starting with `prefix`"""
+        prefix = prefix.strip().lower()
+        results = {kind: {} for kind in KINDS}
+        if not prefix:
+            return results
+        with self.lock:
+            # Each kind is scanned on its own, so common venue names cannot crowd out artists
+            for kind, found in results.items():
+                entries = self.entries[kind]
+                i = bisect_left(entries, (prefix,))
+                end = min(len(entries), i + MAX_SCAN)
+                while i < end and len(found) < limit and entries[i][0].startswith(prefix):
+                    entity_id = entries[i][1]
+                    found[entity_id] = self.names[(kind, entity_id)]
+                    i += 1
+        return results
+
+
+name_index = PrefixIndex()
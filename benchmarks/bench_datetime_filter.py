@@ -0,0 +1,54 @@
+"""Render 10k show tiles with the `datetime` filter, before and after memoization.
+
+    python benchmarks/bench_datetime_filter.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from jinja2 import Environment
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import format_datetime, cached_format_datetime
+
+TEMPLATE = '''{% for show in shows %}<h4>{{ show.start_time|datetime('full') }}</h4>{% endfor %}'''
+SHOWS = 10000
+
+
+def format_datetime_reparse(value, format='medium'):
+    """The filter as it was: re-parse the string and format every call"""
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def render(filter, shows, repeat=3):
+    env = Environment()
+    env.filters['datetime'] = filter
+    template = env.from_string(TEMPLATE)
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        template.render(shows=shows)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == '__main__':
+    # Shows on the hour spread over a year, so timestamps repeat like real listings
+    start = datetime(2035, 1, 1, 20)
+    times = [start + timedelta(hours=i % (24 * 365)) for i in range(SHOWS)]
+
+    before = render(format_datetime_reparse, [{'start_time': str(t)} for t in times])
+    cached_format_datetime.cache_clear()
+    after = render(format_datetime, [{'start_time': t} for t in times])
+
+    print(f'{SHOWS} shows, re-parsing strings: {before * 1000:.1f} ms')
+    print(f'{SHOWS} shows, datetime + memo:    {after * 1000:.1f} ms ({before / after:.1f}x)')
@@ -0,0 +1,136 @@
+"""Drive every read route through the Flask test client and report
+p50/p95 latency, queries per request and peak memory.
+
+    python benchmarks/bench_routes.py --save benchmarks/baseline.json
+    python benchmarks/bench_routes.py --compare benchmarks/baseline.json
+
+A comparison run exits with status 1 when a route's p95 latency grows by more
+than --tolerance, or it issues more queries than in the baseline.
+Write routes (POST create/edit, delete) are left out so runs are repeatable.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from cache import cache
+from models import db, Venue, Artist
+
+app = create_app()
+
+
+def routes():
+    """(name, method, path, form) for every read route, against the busiest entities"""
+    with app.app_context():
+        venue = Venue.query.order_by((Venue.upcoming_shows_count + Venue.past_shows_count).desc()).first()
+        artist = Artist.query.order_by((Artist.upcoming_shows_count + Artist.past_shows_count).desc()).first()
+        venue_id = venue.id if venue else 1
+        artist_id = artist.id if artist else 1
+        located = Venue.query.filter(Venue.latitude.isnot(None)).order_by(Venue.id).first()
+        lat, lon = (located.latitude, located.longitude) if located else (37.7749, -122.4194)
+
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues_near', 'GET', f'/venues/near?lat={lat}&lon={lon}&radius=25', None),
+        ('show_venue', 'GET', f'/venues/{venue_id}', None),
+        ('search_venues', 'POST', '/venues/search', {'search_term': 'the'}),
+        ('create_venue_form', 'GET', '/venues/create', None),
+        ('edit_venue', 'GET', f'/venues/{venue_id}/edit', None),
+        ('artists', 'GET', '/artists', None),
+        ('show_artist', 'GET', f'/artists/{artist_id}', None),
+        ('search_artists', 'POST', '/artists/search', {'search_term': 'band'}),
+        ('create_artist_form', 'GET', '/artists/create', None),
+        ('edit_artist', 'GET', f'/artists/{artist_id}/edit', None),
+        ('shows', 'GET', '/shows', None),
+        ('create_shows', 'GET', '/shows/create', None),
+    ]
+
+
+def measure(client, method, path, form, iterations):
+    queries = []
+
+    def count_query(*args):
+        queries[-1] += 1
+
+    event.listen(Engine, 'before_cursor_execute', count_query)
+    latencies = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            queries.append(0)
+            started = time.perf_counter()
+            response = client.open(path, method=method, data=form)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{method} {path} returned {response.status_code}')
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        event.remove(Engine, 'before_cursor_execute', count_query)
+
+    latencies.sort()
+    return {
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+        'queries': max(queries),
+        'peak_kb': round(peak / 1024),
+    }
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            failures.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            failures.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--save', help='write the results to this baseline file')
+    parser.add_argument('--compare', help='fail on regressions against this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 growth (0.2 = 20%%)')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache enabled')
+    args = parser.parse_args()
+
+    if not args.cache:
+        cache.backend = None
+    client = app.test_client()
+
+    results = {}
+    print(f"{'route':<20} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'peak KB':>8}")
+    for name, method, path, form in routes():
+        client.open(path, method=method, data=form)  # warm up
+        result = results[name] = measure(client, method, path, form, args.iterations)
+        print(f"{name:<20} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['queries']:>8} {result['peak_kb']:>8}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            failures = compare(results, json.load(f), args.tolerance)
+        for failure in failures:
+            print(f'REGRESSION {failure}')
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Measure cold start time, resident memory and modules loaded by create_app().
+
+Each run is a fresh interpreter, so nothing is warm but the OS file cache. The
+first request builds the autocomplete index, so the database must be reachable.
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --preload   # as a gunicorn master would
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Ran in the child: report time to a ready app, peak RSS and module count as JSON
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+from app import create_app, preload
+app = create_app()
+client = app.test_client()
+if {preload}:
+    preload(app)
+ready = time.perf_counter() - start
+client.get('/')
+first = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"ready": ready, "first_request": first, "rss_kb": rss, "modules": len(sys.modules)}}))
+'''
+
+
+def run(preload):
+    output = subprocess.run([sys.executable, '-c', PROBE.format(preload=preload)], cwd=ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--preload', action='store_true', help='also run app.preload() before the first request')
+    args = parser.parse_args()
+
+    results = [run(args.preload) for _ in range(args.runs)]
+    print(f"{'':<16} {'median':>10} {'max':>10}")
+    for key, unit, scale in (('ready', 'ms', 1000), ('first_request', 'ms', 1000),
+                             ('rss_kb', 'MB', 1 / 1024), ('modules', '', 1)):
+        values = [result[key] * scale for result in results]
+        print(f'{key + " " + unit:<16} {statistics.median(values):>10.1f} {max(values):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Fill the database with synthetic venues, artists and shows.
+
+Areas, genres and bookings follow a Zipf-like skew: a few big cities hold most
+venues, a few genres dominate, and popular venues and artists get most shows.
+
+    python benchmarks/generate.py --shows 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from itertools import accumulate
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from forms import genres_choices, state_choices
+from importer import ENTITIES, reset_sequences, write_batch
+from models import db, Venue, Artist
+
+app = create_app()
+
+WORDS = ['Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Rusty', 'Silver', 'Wild',
+         'Crimson', 'Lonely', 'Hidden', 'Neon', 'Broken', 'Lucky', 'Echo', 'Paper']
+VENUE_KINDS = ['Hall', 'Lounge', 'Bar', 'Club', 'Theatre', 'Room', 'Garden', 'Cellar']
+ARTIST_KINDS = ['Band', 'Trio', 'Collective', 'Quartet', 'Orchestra', 'Project', 'Sound']
+
+
+def zipf_weights(n, s=1.1):
+    """Cumulative Zipf weights, ready for random.choices(cum_weights=...)"""
+    return list(accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def pick_genres(rng, genres, weights):
+    return sorted(set(rng.choices(genres, cum_weights=weights, k=rng.randint(1, 3))))
+
+
+def venues(rng, count, areas, area_weights, genres, genre_weights, centers):
+    for _ in range(count):
+        city, state = rng.choices(areas, cum_weights=area_weights)[0]
+        # Scattered a few kilometers around the area's center
+        latitude, longitude = centers[(city, state)]
+        name = f'The {rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(VENUE_KINDS)}'
+        yield {
+            'name': name, 'genres': pick_genres(rng, genres, genre_weights),
+            'address': f'{rng.randint(1, 9999)} {rng.choice(WORDS)} Street',
+            'city': city, 'state': state, 'phone': f'{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}',
+            'website': None, 'facebook_link': None, 'seeking_talent': rng.random() < 0.3,
+            'seeking_description': None, 'image_link': None,
+            'latitude': latitude + rng.gauss(0, 0.03), 'longitude': longitude + rng.gauss(0, 0.03),
+        }
+
+
+def artists(rng, count, areas, area_weights, genres, genre_weights):
+    for _ in range(count):
+        city, state = rng.choices(areas, cum_weights=area_weights)[0]
+        yield {
+            'name': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(ARTIST_KINDS)}',
+            'genres': pick_genres(rng, genres, genre_weights),
+            'city': city, 'state': state, 'phone': f'{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}',
+            'website': None, 'facebook_link': None, 'seeking_venue': rng.random() < 0.4,
+            'seeking_description': None, 'image_link': None,
+        }
+
+
+def shows(rng, count, venue_ids, artist_ids):
+    venue_weights = zipf_weights(len(venue_ids), 0.8)
+    artist_weights = zipf_weights(len(artist_ids), 0.8)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    # Two hour shows starting on the hour; redraw any double booking
+    booked = set()
+    while count:
+        venue_id = rng.choices(venue_ids, cum_weights=venue_weights)[0]
+        artist_id = rng.choices(artist_ids, cum_weights=artist_weights)[0]
+        # Two years of history, one year of upcoming bookings
+        hour = rng.randint(-2 * 365 * 24, 365 * 24)
+        slots = {('venue', venue_id, hour), ('venue', venue_id, hour + 1),
+                 ('artist', artist_id, hour), ('artist', artist_id, hour + 1)}
+        if booked & slots:
+            continue
+        booked |= slots
+        count -= 1
+        start_time = now + timedelta(hours=hour)
+        yield {
+            'venue_id': venue_id, 'artist_id': artist_id,
+            'start_time': start_time, 'end_time': start_time + timedelta(hours=2),
+        }
+
+
+def load(entity, rows, batch_size):
+    connection = db.engine.raw_connection()
+    columns = ENTITIES[entity]['columns']
+    loaded, batch = 0, []
+    started = time.perf_counter()
+    try:
+        for line, row in enumerate(rows):
+            batch.append((line, row))
+            if len(batch) >= batch_size:
+                loaded += write_batch(connection, entity, columns, batch)[0]
+                batch = []
+        if batch:
+            loaded += write_batch(connection, entity, columns, batch)[0]
+        reset_sequences(connection)
+    finally:
+        connection.close()
+    print(f'{entity}: {loaded} rows ({loaded / (time.perf_counter() - started):.0f} rows/sec)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--venues', type=int, help='defaults to shows / 20')
+    parser.add_argument('--artists', type=int, help='defaults to shows / 10')
+    parser.add_argument('--cities', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    states = [state for state, _ in state_choices]
+    areas = [(f'{rng.choice(WORDS)}{rng.choice(["ville", " City", "ton", " Falls"])}', rng.choice(states))
+             for _ in range(args.cities)]
+    area_weights = zipf_weights(len(areas))
+    # Somewhere in the contiguous US
+    centers = {area: (rng.uniform(26, 48), rng.uniform(-123, -70)) for area in areas}
+    genres = [genre for genre, _ in genres_choices]
+    genre_weights = zipf_weights(len(genres))
+
+    with app.app_context():
+        load('venues', venues(rng, args.venues or max(1, args.shows // 20),
+                              areas, area_weights, genres, genre_weights, centers), args.batch_size)
+        load('artists', artists(rng, args.artists or max(1, args.shows // 10),
+                                areas, area_weights, genres, genre_weights), args.batch_size)
+        venue_ids = [venue_id for venue_id, in db.session.query(Venue.id)]
+        artist_ids = [artist_id for artist_id, in db.session.query(Artist.id)]
+        load('shows', shows(rng, args.shows, venue_ids, artist_ids), args.batch_size)
+
+        Venue.refresh_show_counts()
+        Artist.refresh_show_counts()
+        db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
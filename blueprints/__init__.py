@@ -0,0 +1,24 @@
+"""Route blueprints, registered by app.create_app()"""
+from flask import abort, current_app, request
+
+
+def date_range_args():
+    """Parse ?from=&to= (from inclusive, to exclusive), answering 400 to malformed dates"""
+    import dateutil.parser
+    bounds = []
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        try:
+            bounds.append(dateutil.parser.parse(value) if value else None)
+        except (ValueError, OverflowError):
+            abort(400)
+    return bounds
+
+
+def search_page_args():
+    """limit and offset of a search page, clamped to 0 and limit capped at SEARCH_RESULTS_MAX"""
+    limit = request.values.get('limit', current_app.config.get('SEARCH_RESULTS_PER_PAGE'), type=int)
+    if limit is not None:
+        limit = min(max(limit, 0), current_app.config['SEARCH_RESULTS_MAX'])
+    offset = max(request.values.get('offset', 0, type=int), 0)
+    return limit, offset
@@ -0,0 +1,114 @@
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
+
+from blueprints import date_range_args, search_page_args
+from cache import cache
+from conditional import conditional
+from models import Artist
+from routing import read_only
+
+bp = Blueprint('artists', __name__, url_prefix='/artists')
+
+
+# CREATE
+@bp.route('/create', methods=['GET'])
+def create_artist_form():
+    """Returns a form to the user for adding a new Artist"""
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/create', methods=['POST'])
+def create_artist_submission():  
+    """ Called upon submitting the new artist listing form """
+    from forms import ArtistForm
+    # Get the data
+    form = ArtistForm(request.form, csrf_enabled=False)
+    form_data = form.data
+    form_data.update({'seeking_venue': bool(form_data['seeking_venue'])})
+    
+    # Create the venue
+    created = Artist.create(form_data)
+    
+    # Update the user 
+    if created:
+        flash('Artist listed successfully!')
+    else: 
+        flash('Sorry, an error occurred.')
+
+    return render_template('pages/home.html')
+
+# READ
+@bp.route('')
+@read_only
+@conditional.versioned(Artist.listing_version)
+def artists():
+    """List artists by name, one keyset page at a time"""
+    genres = request.args.getlist('genre')
+    page = Artist.paginate(request.args.get('after'), request.args.get('before'),
+                           current_app.config['ARTISTS_PER_PAGE'], genres)
+    return render_template('pages/artists.html', artists=page['items'],
+                           facets=Artist.facets(genres), genres=genres,
+                           next_cursor=page['next'], prev_cursor=page['prev'])
+
+@bp.route('/search', methods=['POST'])
+@read_only
+def search_artists():
+    """Search Artists"""
+    search_term = request.form.get('search_term', '')
+    limit, offset = search_page_args()
+    response = Artist.search(search_term, limit, offset, request.values.getlist('genre'))
+    return render_template('pages/search_artists.html', results=response, search_term=search_term, limit=limit, offset=offset)
+
+@bp.route('/<int:artist_id>')
+@read_only
+@conditional.versioned(Artist.version)
+@cache.cached('artist:{artist_id}')
+def show_artist(artist_id):
+    """Show the venue details page"""
+    start, end = date_range_args()
+    artist = Artist.query.get(artist_id)
+    data = artist.serialize(current_app.config.get('PAST_SHOWS_LIMIT'), start, end)
+    data['similar_artists'] = artist.similar(current_app.config['SIMILAR_ARTISTS_SHOWN'])
+    return render_template('pages/show_artist.html', artist=data)
+
+@bp.route('/<int:artist_id>/similar')
+@read_only
+def similar_artists(artist_id):
+    """Precomputed related artists as JSON"""
+    artist = Artist.query.get(artist_id)
+    if artist is None:
+        abort(404)
+    return jsonify({"artist_id": artist.id, "similar_artists": artist.similar()})
+
+
+# UPDATE
+@bp.route('/<int:artist_id>/edit', methods=['GET'])
+@read_only
+def edit_artist(artist_id):
+    """Returns form populated with the artist data"""
+    from forms import ArtistForm
+    form = ArtistForm()
+    artist = Artist.query.get(artist_id)
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+    
+
+@bp.route('/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id): 
+    """Edit a venue using it's id"""
+    from forms import ArtistForm
+    # Get form data
+    form = ArtistForm(request.form, meta={'csrf': False})
+    form_data = form.data
+
+    # Get the artist
+    artist = Artist.query.get(artist_id)  
+
+    # Update the venue
+    updated = artist.update(**form_data)
+    
+    if updated:
+        flash('Artist updatdeded successfully!')
+        return redirect(url_for('artists.show_artist', artist_id=artist_id))                       
+    else: 
+        flash('Sorry, an error occurred.')
+        return redirect(url_for('artists.edit_artist', artist_id=artist_id))                       
@@ -0,0 +1,57 @@
+from flask import Blueprint, Response, abort, jsonify, render_template, request, current_app, stream_with_context
+
+from autocomplete import name_index
+from routing import read_only
+
+bp = Blueprint('main', __name__)
+
+
+""" HOME PAGE """
+
+@bp.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+""" AUTOCOMPLETE """
+
+@bp.route('/autocomplete')
+def autocomplete():
+    """Venue and artist names matching a typed prefix, served from memory"""
+    name_index.ensure_current()
+    results = name_index.search(request.args.get('q', ''), current_app.config['AUTOCOMPLETE_LIMIT'])
+    return jsonify({
+        "venues": [{"id": venue_id, "name": name} for venue_id, name in results['venue'].items()],
+        "artists": [{"id": artist_id, "name": name} for artist_id, name in results['artist'].items()]
+    })
+
+
+""" EXPORTS """
+
+@bp.route('/export/<any(venues, artists, shows):entity>')
+@read_only
+def export(entity):
+    """Stream a full or incremental (?since=) dump as CSV or NDJSON (?format=)"""
+    import dateutil.parser
+    import exporter
+    format = request.args.get('format', 'csv')
+    if format not in exporter.FORMATS:
+        abort(400)
+    since = request.args.get('since')
+    if since:
+        try:
+            since = dateutil.parser.parse(since)
+        except (ValueError, OverflowError):
+            abort(400)
+
+    response = Response(stream_with_context(exporter.generate(entity, format, since or None)),
+                        mimetype=exporter.FORMATS[format])
+    response.headers['Content-Disposition'] = f'attachment; filename={entity}.{format}'
+    return response
+
+
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,102 @@
+import io
+
+from flask import Blueprint, abort, current_app, flash, jsonify, render_template, request
+
+from blueprints import date_range_args
+from cache import cache
+from conditional import conditional
+from models import BookingConflict, Show
+from routing import read_only
+
+bp = Blueprint('shows', __name__, url_prefix='/shows')
+
+
+# READ
+@bp.route('')
+@read_only
+@conditional.versioned(Show.listing_version)
+@cache.cached('shows')
+def shows():                                                      #DONE
+  """ displays list of shows at /shows """
+  start, end = date_range_args()
+  page = Show.paginate(request.args.get('after'), request.args.get('before'),
+                       current_app.config['SHOWS_PER_PAGE'], start, end)
+  range_args = {name: request.args[name] for name in ('from', 'to') if request.args.get(name)}
+  return render_template('pages/shows.html', shows=page['items'], range_args=range_args,
+                         next_cursor=page['next'], prev_cursor=page['prev'])
+
+@bp.route('/create')
+def create_shows():
+  """ renders form. do not touch """
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@bp.route('/create', methods=['POST'])
+def create_show_submission():                                      #DONE
+    """ called upon submitting the new artist listing form """
+    from forms import ShowForm
+
+    form = ShowForm(request.form, csrf_enabled=False)
+    if not form.validate():
+        for name, errors in form.errors.items():
+            flash(f'Sorry, the show could not be listed ({name}: {errors[0]})')
+        return render_template('pages/home.html')
+    form_data = form.data
+ 
+    # Create the venue
+    try:
+        created = Show.create(form_data)
+    except BookingConflict:
+        flash('Sorry, the venue or the artist is already booked at that time.')
+        return render_template('pages/home.html')
+
+    # Update the user 
+    if created:
+        flash('Show listed successfully!')
+    else: 
+        flash('Sorry, an error occurred.')
+
+    return render_template('pages/home.html')
+
+
+@bp.route('/batch', methods=['POST'])
+def create_show_batch():
+    """Book a list of shows in one transaction, all or none.
+
+    Accepts a JSON list (or {"shows": [...]}) or a CSV upload (`file` field or
+    request body) with venue_id, artist_id, start_time and optional end_time.
+    """
+    from importer import clean, read_csv
+    if request.is_json:
+        records = request.get_json(silent=True)
+        if isinstance(records, dict):
+            records = records.get('shows')
+    else:
+        upload = request.files.get('file')
+        try:
+            text = upload.read().decode('utf-8-sig') if upload else request.get_data(as_text=True)
+        except UnicodeDecodeError:
+            return jsonify({"error": "The CSV must be UTF-8 encoded"}), 400
+        records = list(read_csv(io.StringIO(text)))
+    if not records or not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        abort(400)
+    if len(records) > current_app.config['SHOW_BATCH_LIMIT']:
+        abort(413)
+
+    shows, errors = [], {}
+    for i, record in enumerate(records):
+        values, row_errors = clean('shows', record)
+        if row_errors:
+            errors[i] = row_errors
+        else:
+            shows.append({field: values.get(field) for field in ('venue_id', 'artist_id', 'start_time', 'end_time')})
+    if not errors:
+        try:
+            ids, errors = Show.create_batch(shows)
+        except BookingConflict:
+            return jsonify({"error": "A show was booked concurrently, please retry"}), 409
+    if errors:
+        return jsonify({"errors": [{"row": i + 1, "errors": row_errors}
+                                   for i, row_errors in sorted(errors.items())]}), 422
+    return jsonify({"created": ids}), 201
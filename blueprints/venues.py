@@ -0,0 +1,143 @@
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
+
+from blueprints import date_range_args, search_page_args
+from cache import cache
+from conditional import conditional
+from models import Venue
+from routing import read_only
+
+METERS_PER_MILE = 1609.344
+
+bp = Blueprint('venues', __name__, url_prefix='/venues')
+
+
+# CREATE
+@bp.route('/create', methods=['GET'])
+def create_venue_form():
+    """Returns a form to the user for adding a new venue"""
+    from forms import VenueForm
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/create', methods=['POST'])
+def create_venue_submission():
+    """ Called upon submitting the new artist listing form """
+    from forms import VenueForm
+    # Get the data
+    form = VenueForm(request.form,  meta={'csrf': False})
+    form_data = form.data
+    form_data.update({"seeking_talent": bool(form_data['seeking_talent'])})
+
+    # Create the venue
+    created = Venue.create(form_data)
+    
+    # Update the user 
+    if created:
+        flash('Venue listed successfully!')
+    else: 
+        flash('Sorry, an error occurred.')
+
+    return render_template('pages/home.html')
+
+# READ
+@bp.route('')
+@read_only
+@conditional.versioned(Venue.directory_version)
+@cache.cached('venues')
+def venues():
+    """List venues grouped by area (city, state), AREAS_PER_PAGE areas at a time when set"""
+    genres = request.args.getlist('genre')
+    facets = Venue.facets(genres)
+    per_page = current_app.config.get('AREAS_PER_PAGE')
+    if not per_page:
+        return render_template('pages/venues.html', areas=Venue.group_by_area(genres=genres),
+                               facets=facets, genres=genres)
+
+    page = Venue.paginate(request.args.get('after'), request.args.get('before'), per_page, genres)
+    return render_template('pages/venues.html', areas=page['items'], facets=facets, genres=genres,
+                           next_cursor=page['next'], prev_cursor=page['prev'])
+
+@bp.route('/search', methods=['POST'])
+@read_only
+def search_venues():
+    """Search venues"""
+    search_term = request.form.get('search_term', '')
+    limit, offset = search_page_args()
+    response = Venue.search(search_term, limit, offset, request.values.getlist('genre'))
+    return render_template('pages/search_venues.html', results=response, search_term=search_term, limit=limit, offset=offset)
+
+@bp.route('/near')
+@read_only
+def venues_near():
+    """Venues within ?radius= miles of ?lat=&lon=, closest first, as JSON"""
+    config = current_app.config
+    try:
+        latitude = float(request.args['lat'])
+        longitude = float(request.args['lon'])
+        radius = float(request.args.get('radius', config['NEAR_RADIUS_MILES']))
+    except (KeyError, ValueError):
+        abort(400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180
+            and 0 < radius <= config['NEAR_MAX_RADIUS_MILES']):
+        abort(400)
+
+    venues = Venue.near(latitude, longitude, radius * METERS_PER_MILE, config['NEAR_RESULTS_LIMIT'])
+    for venue in venues:
+        venue['distance'] = round(venue['distance'] / METERS_PER_MILE, 2)
+    return jsonify({"venues": venues})
+
+
+@bp.route('/<int:venue_id>')
+@read_only
+@conditional.versioned(Venue.version)
+@cache.cached('venue:{venue_id}')
+def show_venue(venue_id):
+    """Show the venue details page"""
+    start, end = date_range_args()
+    venue = Venue.query.get(venue_id)
+    return render_template('pages/show_venue.html', venue=venue.serialize(current_app.config.get('PAST_SHOWS_LIMIT'), start, end))
+
+# UPDATE
+@bp.route('/<int:venue_id>/edit', methods=['GET'])
+@read_only
+def edit_venue(venue_id):
+    """Returns form populated with the artist data"""
+    from forms import VenueForm
+    form = VenueForm()
+    venue = Venue.query.get(venue_id)
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@bp.route('/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    """Edit a venue using it's id"""
+    from forms import VenueForm
+    # Get form data
+    form = VenueForm(request.form, meta={'csrf': False})
+    form_data = form.data
+
+    # Get the venue
+    venue = Venue.query.get(venue_id)  
+
+    # Update the venue
+    updated = venue.update(**form_data)
+    
+    if updated:
+        flash('Venue updatdeded successfully!')
+        return redirect(url_for('venues.show_venue', venue_id=venue_id))
+    else: 
+        flash('Sorry, an error occurred.')
+        return redirect(url_for('venues.edit_venue', venue_id=venue_id))
+
+
+# DELETE
+@bp.route('/<venue_id>/delete', methods=['GET'])
+def delete_venue(venue_id):
+    """Delete a venue using it's id"""
+    venue = Venue.query.get(venue_id)
+    deleted = venue.delete()
+    if deleted:
+        flash('Venue deleted successfully!')
+    else: 
+        flash('Sorry, an error occurred.')
+
+    return redirect(url_for('venues.venues'))
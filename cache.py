@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+import logging
+import time
+
+from flask import request, session
+
+logger = logging.getLogger(__name__)
+
+
+class LRUBackend:
+    """In-process cache bounded to `max_entries`, least recently used evicted first"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisBackend:
+    """Cache shared between workers, stored in Redis.
+
+    Redis errors are logged and treated as misses (or dropped writes), so an
+    unreachable server slows pages down instead of failing them.
+    """
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=0.5, socket_timeout=0.5)
+        self.errors = redis.RedisError
+
+    def get(self, key):
+        try:
+            value = self.client.get(key)
+        except self.errors:
+            logger.warning('cache get of %s failed', key, exc_info=True)
+            return None
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.setex(key, int(ttl) + 1, value)
+        except self.errors:
+            logger.warning('cache set of %s failed', key, exc_info=True)
+
+    def delete_prefix(self, prefix):
+        try:
+            keys = list(self.client.scan_iter(match=prefix + '*'))
+            if keys:
+                self.client.delete(*keys)
+        except self.errors:
+            logger.warning('cache invalidation of %s* failed', prefix, exc_info=True)
+
+    def clear(self):
+        self.delete_prefix('')
+
+
+class ResponseCache:
+    """Caches rendered pages per route and entity.
+
+    Keys look like `venue:<id>:<bucket>`; the trailing time bucket makes
+    upcoming/past splits expire after CACHE_TTL seconds even without writes,
+    and lets writes invalidate every bucket of an entity with one prefix.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 60
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CACHE_TTL', 60)
+        backend = app.config.get('CACHE_BACKEND', 'lru')
+        if backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        elif backend == 'lru':
+            self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        else:
+            self.backend = None
+
+    def key(self, name):
+        return f'{name}:{int(time.time() // self.ttl)}'
+
+    def cached(self, name):
+        """Cache the view's response under `name`, formatted with the view arguments"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pages carrying flashed messages are specific to one visitor
+                if self.backend is None or session.get('_flashes'):
+                    return view(**kwargs)
+
+                key = self.key(name.format(**kwargs))
+                if request.query_string:
+                    key += ':' + request.query_string.decode()
+                response = self.backend.get(key)
+                if response is None:
+                    response = view(**kwargs)
+                    if isinstance(response, str):
+                        self.backend.set(key, response, self.ttl)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *names):
+        if self.backend is None:
+            return
+        for name in names:
+            self.backend.delete_prefix(name + ':')
+
+
+cache = ResponseCache()
@@ -0,0 +1,105 @@
+"""Fail if a model query method sequentially scans a large table.
+
+Runs every query issued by the model read methods through EXPLAIN and exits
+with status 1 when a plan contains a Seq Scan on a table holding more than
+--threshold rows (small tables are legitimately scanned by the planner).
+
+    python check_queries.py --threshold 10000
+"""
+import argparse
+import json
+import sys
+
+from sqlalchemy import event
+
+from app import create_app
+from models import db, Genre, Venue, Artist, Show
+
+app = create_app()
+
+
+def capture_statements(calls):
+    """Run each call and collect the (statement, parameters) it executes"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for name, call in calls:
+            del statements[:]
+            call()
+            yield name, list(statements)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seq_scans(plan):
+    """Yield the relation names of every Seq Scan node in a JSON plan"""
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child)
+
+
+def table_sizes():
+    # shows is partitioned by month, so its scans name the shows_YYYY_MM partitions
+    rows = db.session.execute(
+        "SELECT relname, reltuples FROM pg_class "
+        "WHERE relkind = 'r' AND (relname IN ('venues', 'artists', 'shows', 'venue_genres', 'artist_genres') OR relname LIKE 'shows\\_%')")
+    return {relname: reltuples for relname, reltuples in rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threshold', type=int, default=10000,
+                        help='row count above which a sequential scan is an error')
+    args = parser.parse_args()
+
+    with app.app_context():
+        venue = Venue.query.order_by(Venue.id).first()
+        artist = Artist.query.order_by(Artist.id).first()
+        genre = Genre.query.order_by(Genre.id).first()
+        calls = [
+            ('Venue.group_by_area', Venue.group_by_area),
+            ('Venue.search', lambda: Venue.search('the', limit=20)),
+            ('Artist.search', lambda: Artist.search('the', limit=20)),
+            ('Venue.paginate', Venue.paginate),
+            ('Artist.paginate', Artist.paginate),
+            ('Show.paginate', Show.paginate),
+        ]
+        if genre:
+            calls.append(('Venue.group_by_area genre', lambda: Venue.group_by_area(genres=[genre.name])))
+            calls.append(('Artist.paginate genre', lambda: Artist.paginate(genres=[genre.name])))
+        if venue and venue.latitude is not None:
+            calls.append(('Venue.near', lambda: Venue.near(venue.latitude, venue.longitude, 50000, 50)))
+        if venue:
+            calls.append(('Venue.load_shows', venue.load_shows))
+        if artist:
+            calls.append(('Artist.load_shows', artist.load_shows))
+
+        sizes = table_sizes()
+        failures = 0
+        for name, statements in capture_statements(calls):
+            failed_before = failures
+            for statement, parameters in statements:
+                cursor = db.session.connection().connection.cursor()
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                for relation in seq_scans(plan[0]['Plan']):
+                    rows = sizes.get(relation, 0)
+                    if rows > args.threshold:
+                        failures += 1
+                        print(f'FAIL {name}: Seq Scan on {relation} (~{int(rows)} rows)\n  {statement}')
+            if failures == failed_before:
+                print(f'ok   {name}: {len(statements)} statement(s) checked')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""flask CLI commands, registered on the app by create_app()"""
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from cache import cache
+from directory import area_directory
+from models import db, Venue, Artist, Show
+
+
+@click.command('rollover-shows')
+@click.option('--minutes', default=60, help='How far back to look for shows that have started.')
+@with_appcontext
+def rollover_shows(minutes):
+    """Move shows that started recently from the upcoming to the past counters.
+
+    Meant to run periodically (e.g. from cron) at least every --minutes.
+    """
+    started = Show.rollover(datetime.now() - timedelta(minutes=minutes))
+    if started:
+        area_directory.refresh()
+    click.echo(f'{started} show(s) rolled over')
+
+@click.command('refresh-area-directory')
+@with_appcontext
+def refresh_area_directory():
+    """Rebuild the materialized /venues directory now"""
+    area_directory.refresh()
+    click.echo('venue directory refreshed')
+
+@click.command('reconcile-show-counts')
+@with_appcontext
+def reconcile_show_counts():
+    """Recompute every venue and artist show counter from the shows table"""
+    venues = Venue.refresh_show_counts()
+    artists = Artist.refresh_show_counts()
+    db.session.commit()
+    click.echo(f'{venues} venue(s) and {artists} artist(s) reconciled')
+
+@click.command('import-data')
+@click.argument('entity', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=10000, help='Rows sent per COPY batch.')
+@with_appcontext
+def import_data(entity, path, batch_size):
+    """Stream a CSV or NDJSON file of venues, artists or shows into the database"""
+    from importer import import_file
+    imported, rejected = import_file(entity, path, batch_size, echo=click.echo)
+    if imported and entity != 'artists':
+        area_directory.refresh()
+    click.echo(f'{imported} {entity} imported, {rejected} rejected')
+
+@click.command('export-data')
+@click.argument('entity', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']), default='csv')
+@click.option('--since', type=click.DateTime(), help='Only rows updated after this time.')
+@click.option('--output', type=click.File('w'), default='-', help='Defaults to stdout.')
+@with_appcontext
+def export_data(entity, format, since, output):
+    """Stream venues, artists or shows to a CSV or NDJSON file"""
+    from exporter import generate
+    for chunk in generate(entity, format, since):
+        output.write(chunk)
+
+@click.command('geocode-venues')
+@click.argument('gazetteer', type=click.Path(exists=True, dir_okay=False))
+@click.option('--all', 'everything', is_flag=True, help='Re-geocode venues that already have coordinates.')
+@with_appcontext
+def geocode_venues(gazetteer, everything):
+    """Set venue coordinates from a local city/state gazetteer CSV"""
+    import geocode
+    located, unknown = geocode.geocode_venues(gazetteer, everything)
+    for city, state in unknown:
+        click.echo(f'not in gazetteer: {city}, {state}')
+    click.echo(f'{located} venues geocoded')
+
+@click.command('compute-similar-artists')
+@click.option('--full', is_flag=True, help='Recompute every artist, not only those touched since the last run.')
+@click.option('--top-k', default=10, help='Similar artists kept per artist.')
+@with_appcontext
+def compute_similar_artists(full, top_k):
+    """Rebuild the precomputed similar artists (needs numpy and scipy)"""
+    import similarity
+    count = similarity.compute(top_k, full)
+    if count:
+        cache.invalidate('artist')
+    click.echo(f'similar artists recomputed for {count} artists')
+
+@click.command('build-assets')
+@click.option('--clean', is_flag=True, help='Delete the files of earlier builds first.')
+@with_appcontext
+def build_assets(clean):
+    """Fingerprint and precompress static/ into static/build (restart to pick it up)"""
+    import assets
+    manifest = assets.build(current_app.static_folder, clean)
+    click.echo(f'{len(manifest)} assets built')
+
+@click.command('create-show-partitions')
+@click.option('--months-ahead', default=12, help='Months after the current one to create.')
+@with_appcontext
+def create_show_partitions(months_ahead):
+    """Create the monthly shows partitions for upcoming bookings"""
+    from partitions import create_partitions
+    for name in create_partitions(months_ahead):
+        click.echo(f'created {name}')
+
+@click.command('archive-show-partitions')
+@click.option('--before', type=click.DateTime(['%Y-%m', '%Y-%m-%d']), required=True,
+              help='Archive the months before this one.')
+@click.option('--drop', is_flag=True, help='Drop the partitions instead of keeping them as archive tables.')
+@with_appcontext
+def archive_show_partitions(before, drop):
+    """Detach (and optionally drop) the monthly shows partitions before a month"""
+    from partitions import archive_partitions
+    archived = archive_partitions(before.date(), drop)
+    for name in archived:
+        click.echo(f'{"dropped" if drop else "archived"} {name}')
+    if archived:
+        area_directory.refresh()
+
+
+COMMANDS = [
+    rollover_shows, refresh_area_directory, reconcile_show_counts, import_data, export_data,
+    geocode_venues, compute_similar_artists, build_assets, create_show_partitions, archive_show_partitions,
+]
+
+def init_app(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
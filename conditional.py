@@ -0,0 +1,75 @@
+"""Conditional GET for pages whose content can be versioned cheaply.
+
+A view decorated with conditional.versioned(version) first calls version(),
+which returns the change markers of everything the page displays (mostly
+updated_at maxima read from indexes). They are hashed with the request path
+into a weak ETag; when the client already holds it the answer is an empty
+304 and the view, with its serialize queries and template, never runs.
+"""
+from datetime import datetime, timezone
+from functools import wraps
+import hashlib
+import os
+
+from flask import current_app, make_response, request, session
+
+# Settings that change what a page renders without touching the data
+RENDER_SETTINGS = ('PAST_SHOWS_LIMIT', 'AREAS_PER_PAGE', 'ARTISTS_PER_PAGE', 'SHOWS_PER_PAGE',
+                   'SIMILAR_ARTISTS_SHOWN')
+
+
+class ConditionalResponses:
+
+    def __init__(self):
+        self.salt = ''
+
+    def init_app(self, app):
+        # A deploy that edits a template or rebuilds the assets must not be answered with 304s
+        templates = os.path.join(app.root_path, app.template_folder)
+        mtimes = [os.path.getmtime(os.path.join(root, name))
+                  for root, _, names in os.walk(templates) for name in names]
+        manifest = os.path.join(app.static_folder, 'build', 'manifest.json')
+        if os.path.exists(manifest):
+            mtimes.append(os.path.getmtime(manifest))
+        settings = [app.config.get(name) for name in RENDER_SETTINGS]
+        self.salt = repr((max(mtimes, default=0), settings))
+
+    def versioned(self, version):
+        """Answer 304 Not Modified while version(**view_args) is unchanged"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pages carrying flashed messages are specific to one visit
+                if session.get('_flashes'):
+                    return view(**kwargs)
+                markers = version(**kwargs)
+                if markers is None:
+                    return view(**kwargs)
+
+                etag = hashlib.sha1(repr((self.salt, request.full_path, tuple(markers))).encode()).hexdigest()
+                # updated_at columns hold local time, HTTP dates are GMT
+                modified = max((marker for marker in markers if isinstance(marker, datetime)), default=None)
+                if modified is not None:
+                    modified = modified.astimezone(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+                if request.if_none_match:
+                    not_modified = request.if_none_match.contains_weak(etag)
+                else:
+                    since = request.if_modified_since
+                    not_modified = bool(since and modified and modified <= since.replace(tzinfo=None))
+
+                if not_modified:
+                    response = current_app.response_class(status=304)
+                else:
+                    response = make_response(view(**kwargs))
+                response.set_etag(etag, weak=True)
+                if modified is not None:
+                    response.last_modified = modified
+                # Cacheable, but revalidated on every use
+                response.cache_control.no_cache = True
+                return response
+            return wrapper
+        return decorator
+
+
+conditional = ConditionalResponses()
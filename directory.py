@@ -0,0 +1,60 @@
+from datetime import datetime
+from threading import Lock, Timer
+
+from sqlalchemy import text
+
+
+class AreaDirectory:
+    """Debounced, concurrent refresh of the venue_directory materialized view.
+
+    Writes call schedule_refresh(); the first call starts a timer and the
+    calls that follow within AREA_DIRECTORY_REFRESH_DELAY seconds join it, so
+    a burst of writes costs one refresh.
+
+    The view's upcoming show counts move only when shows are written or when
+    `flask rollover-shows` runs, so that command has to be scheduled.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.delay = 2
+        self.timer = None
+        self.lock = Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.delay = app.config.get('AREA_DIRECTORY_REFRESH_DELAY', 2)
+
+    def schedule_refresh(self):
+        if self.app is None:
+            return
+        with self.lock:
+            if self.timer is not None:
+                return
+            self.timer = Timer(self.delay, self.scheduled_refresh)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def scheduled_refresh(self):
+        # Runs in the timer thread, where an exception would vanish
+        try:
+            self.refresh()
+        except Exception:
+            self.app.logger.exception('venue directory refresh failed')
+
+    def refresh(self):
+        from cache import cache
+        from models import db, job_run, DIRECTORY_JOB
+        with self.lock:
+            self.timer = None
+        with self.app.app_context():
+            started = datetime.now()
+            with db.engine.begin() as connection:
+                connection.execute(text('REFRESH MATERIALIZED VIEW CONCURRENTLY venue_directory'))
+                # Read by Venue.directory_version() for the /venues ETag
+                connection.execute(job_run(DIRECTORY_JOB, started))
+            # Pages cached while the view was stale
+            cache.invalidate('venues')
+
+
+area_directory = AreaDirectory()
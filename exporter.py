@@ -0,0 +1,61 @@
+"""Streaming export of venues, artists and shows as CSV or NDJSON.
+
+Rows come from a server-side cursor and are emitted in chunks, so memory use
+does not depend on the size of the table.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from importer import ENTITIES, copy_value
+from models import db, genre_names, Venue, Artist, Show
+
+MODELS = {'venues': Venue, 'artists': Artist, 'shows': Show}
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+CHUNK_SIZE = 64 * 1024
+
+
+def export_columns(entity):
+    """Same columns the importer reads, so an export can be imported back"""
+    return ['id'] + ENTITIES[entity]['columns'] + ['updated_at']
+
+
+def export_rows(entity, since=None, batch_size=1000):
+    """Yield rows of `entity` ordered by id, optionally only those updated after `since`"""
+    model = MODELS[entity]
+    query = db.session.query(*[genre_names(model) if column == 'genres' else getattr(model, column)
+                               for column in export_columns(entity)])
+    if since is not None:
+        query = query.filter(model.updated_at > since)
+    return query.order_by(model.id)\
+        .execution_options(stream_results=True)\
+        .yield_per(batch_size)
+
+
+def json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def generate(entity, format='csv', since=None):
+    """Yield the export of `entity` as text chunks of about CHUNK_SIZE characters"""
+    columns = export_columns(entity)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == 'csv':
+        writer.writerow(columns)
+
+    for row in export_rows(entity, since):
+        if format == 'csv':
+            writer.writerow([copy_value(value) for value in row])
+        else:
+            buffer.write(json.dumps({column: json_value(value) for column, value in zip(columns, row)}) + '\n')
+
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
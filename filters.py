@@ -0,0 +1,23 @@
+"""Jinja filters. babel and dateutil are imported on first use, not at startup."""
+from datetime import datetime
+from functools import lru_cache
+
+
+@lru_cache(maxsize=8192)
+def cached_format_datetime(date, format, locale):
+  import babel.dates
+  return babel.dates.format_datetime(date, format, locale=locale)
+
+def format_datetime(value, format='medium'):
+  import babel.dates
+  # Models hand over datetime objects; strings are still accepted
+  if isinstance(value, datetime):
+      date = value
+  else:
+      import dateutil.parser
+      date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return cached_format_datetime(date, format, str(babel.dates.LC_TIME))
@@ -1,8 +1,8 @@
   
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_wtf import FlaskForm
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, AnyOf, URL, Optional, ValidationError
 
 state_choices = [
         ('AL', 'AL'),
@@ -97,6 +97,16 @@ class ShowForm(FlaskForm):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # Defaults to two hours after start_time
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()]
+    )
+
+    def validate_end_time(self, field):
+        start = self.start_time.data
+        if start and not start < field.data <= start + timedelta(hours=24):
+            raise ValidationError('End time must be after the start time and within 24 hours of it')
 
 class VenueForm(FlaskForm):
     name = StringField(
@@ -0,0 +1,75 @@
+"""Jinja fragment cache: {% cache key[, ttl] %}...{% endcache %}.
+
+The key is a string or a list joined with ':', e.g.
+['show-tile', show.show_id, show.version]; put the data's version in it, so
+fragments never need invalidating and stale ones just age out of the store.
+The first key part names the fragment kind in the hit/miss counters on /metrics.
+The babel time locale, which the `datetime` filter formats with, is added to
+every key.
+"""
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import LRUBackend, RedisBackend
+from metrics import query_metrics
+
+
+class FragmentCache:
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 3600
+        self.hits = query_metrics.counter(
+            'fyyur_fragment_cache_hits_total', 'Template fragment cache hits.', 'fragment')
+        self.misses = query_metrics.counter(
+            'fyyur_fragment_cache_misses_total', 'Template fragment cache misses.', 'fragment')
+
+    def init_app(self, app):
+        self.ttl = app.config.get('FRAGMENT_CACHE_TTL', 3600)
+        backend = app.config.get('FRAGMENT_CACHE_BACKEND', 'lru')
+        if backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        elif backend == 'lru':
+            self.backend = LRUBackend(app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+        else:
+            self.backend = None
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+
+    def fetch(self, key, ttl, render):
+        """The cached fragment under `key`, rendered and stored on a miss"""
+        if self.backend is None:
+            return render()
+        import babel.dates
+        parts = key if isinstance(key, (list, tuple)) else [key]
+        kind = str(parts[0])
+        key = f'fragment:{babel.dates.LC_TIME}:' + ':'.join(str(part) for part in parts)
+
+        fragment = self.backend.get(key)
+        (self.hits if fragment is not None else self.misses).inc(kind)
+        if fragment is not None:
+            return Markup(fragment)
+        fragment = render()
+        self.backend.set(key, str(fragment), ttl or self.ttl)
+        return fragment
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache', args), [], [], body).set_lineno(lineno)
+
+    def _cache(self, key, ttl, caller):
+        return self.environment.fragment_cache.fetch(key, ttl, caller)
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,54 @@
+"""Offline geocoding of venues from a local gazetteer file.
+
+The gazetteer is a CSV with city, state, latitude and longitude columns (one
+row per place, e.g. a trimmed GeoNames or Census places export). Venues are
+placed at their city's coordinates; no request leaves the machine.
+
+    flask geocode-venues seed_data/gazetteer.csv
+"""
+import csv
+from datetime import datetime
+
+from models import db, Venue
+
+
+def place_key(city, state):
+    return ' '.join((city or '').lower().split()), (state or '').strip().upper()
+
+
+def read_gazetteer(path):
+    """Map (city, state) keys to (latitude, longitude)"""
+    places = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f, skipinitialspace=True):
+            places[place_key(row['city'], row['state'])] = (float(row['latitude']), float(row['longitude']))
+    return places
+
+
+def geocode_venues(path, everything=False, batch_size=1000):
+    """Set the coordinates of venues not geocoded yet (or of all venues with `everything`).
+
+    Returns the number of venues located and the (city, state) pairs the
+    gazetteer does not know.
+    """
+    places = read_gazetteer(path)
+    query = db.session.query(Venue.id, Venue.city, Venue.state)
+    if not everything:
+        query = query.filter(Venue.latitude.is_(None))
+
+    located, unknown = [], set()
+    for venue_id, city, state in query:
+        point = places.get(place_key(city, state))
+        if point is None:
+            unknown.add((city, state))
+        else:
+            located.append({'venue_id': venue_id, 'latitude': point[0], 'longitude': point[1]})
+
+    now = datetime.now()
+    statement = Venue.__table__.update()\
+        .where(Venue.id == db.bindparam('venue_id'))\
+        .values(latitude=db.bindparam('latitude'), longitude=db.bindparam('longitude'), updated_at=now)
+    for start in range(0, len(located), batch_size):
+        db.session.execute(statement, located[start:start + batch_size])
+    db.session.commit()
+    return len(located), sorted(unknown, key=lambda place: tuple(part or '' for part in place))
@@ -0,0 +1,36 @@
+"""gunicorn settings: gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is loaded once in the master and warmed by app.preload() before the
+workers fork, so they start serving at once and share its memory pages.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get('BIND', '0.0.0.0:' + os.environ.get('PORT', '5000'))
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# config.py shares the response cache through redis when several workers run
+os.environ['WEB_CONCURRENCY'] = str(workers)
+preload_app = True
+# Workers' metrics files, summed by /metrics (see metrics.QueryMetrics)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'fyyur-metrics'))
+
+
+def on_starting(server):
+    # Totals left over from an earlier master
+    for path in glob.glob(os.path.join(os.environ['METRICS_DIR'], '*.json')):
+        os.remove(path)
+
+
+def when_ready(server):
+    from app import preload
+    from wsgi import app
+    preload(app)
+
+
+def post_fork(server, worker):
+    # Pooled connections opened in the master must not be shared
+    from app import dispose_engines
+    from wsgi import app
+    dispose_engines(app)
@@ -0,0 +1,337 @@
+"""Streaming bulk import of venues, artists and shows.
+
+Records are read lazily from CSV or NDJSON files, validated with the same
+rules as the web forms, and written with COPY FROM STDIN in batches so memory
+stays bounded however large the file is. A file is imported in one
+transaction: an error aborts the whole import, not just the current batch.
+"""
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from itertools import chain
+
+from dateutil import parser as date_parser
+from werkzeug.datastructures import MultiDict
+
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, DEFAULT_SHOW_DURATION, Venue, Artist
+
+ENTITIES = {
+    'venues': {
+        'form': VenueForm,
+        'columns': ['name', 'genres', 'address', 'city', 'state', 'phone', 'website',
+                    'facebook_link', 'seeking_talent', 'seeking_description', 'image_link',
+                    'latitude', 'longitude'],
+    },
+    'artists': {
+        'form': ArtistForm,
+        'columns': ['name', 'genres', 'city', 'state', 'phone', 'website',
+                    'facebook_link', 'seeking_venue', 'seeking_description', 'image_link'],
+    },
+    'shows': {
+        'form': ShowForm,
+        'columns': ['venue_id', 'artist_id', 'start_time', 'end_time'],
+    },
+}
+
+# Fields a record may leave blank even though the form would reject it
+# (the forms have no Optional() validators, e.g. URL() fails on an empty link)
+BLANK_ALLOWED = {'phone', 'website', 'facebook_link', 'image_link',
+                 'seeking_talent', 'seeking_venue', 'seeking_description'}
+
+BOOLEANS = {'seeking_talent', 'seeking_venue'}
+
+# Genres are not a column: they go to the genres table and these association tables
+TAGGED = {'venues': ('venue_genres', 'venue_id'), 'artists': ('artist_genres', 'artist_id')}
+TRUE_VALUES = {'t', 'true', 'y', 'yes', '1'}
+
+DATETIMES = {'start_time', 'end_time'}
+
+# Raised by the per-partition booking constraints of shows and by the
+# shows_month_boundary trigger for shows running into another month
+EXCLUSION_VIOLATION = '23P01'
+
+# Not form fields, so checked here
+COORDINATES = {'latitude': 90, 'longitude': 180}
+
+# Key of the fields a CSV row has beyond its header; such rows are rejected
+EXTRA_FIELDS = '_extra'
+
+
+def read_csv(f):
+    """Yield one dict per row of a CSV text stream with a header"""
+    for record in csv.DictReader(f, skipinitialspace=True, restkey=EXTRA_FIELDS):
+        yield {key.strip(): value for key, value in record.items()}
+
+
+def read_records(path):
+    """Yield one dict per record of a CSV (with header) or NDJSON file"""
+    with open(path, newline='') as f:
+        if path.endswith(('.ndjson', '.jsonl')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from read_csv(f)
+
+
+def parse_genres(value):
+    """Accept a list, a Postgres array literal `{a,b}` or a comma separated string"""
+    if isinstance(value, list):
+        return value
+    return [genre.strip().strip('"') for genre in value.strip('{}').split(',') if genre.strip()]
+
+
+def clean(entity, record):
+    """Normalize a raw record and validate it against the entity's form.
+
+    Returns (values, errors) where values maps column names to database values.
+    """
+    if EXTRA_FIELDS in record:
+        return None, {'row': [f'{len(record[EXTRA_FIELDS])} more field(s) than the header']}
+    values = {}
+    for name, value in record.items():
+        if value is None or (isinstance(value, str) and value.strip() in ('', 'NULL')):
+            value = None
+        elif name == 'genres':
+            if not (isinstance(value, str) or
+                    isinstance(value, list) and all(isinstance(genre, str) for genre in value)):
+                return None, {name: ['Not a valid list of genres']}
+            value = parse_genres(value)
+        elif name in BOOLEANS and not isinstance(value, bool):
+            value = str(value).strip().lower() in TRUE_VALUES
+        elif name in COORDINATES:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return None, {name: ['Not a valid coordinate']}
+            if abs(value) > COORDINATES[name]:
+                return None, {name: ['Not a valid coordinate']}
+        elif name in DATETIMES:
+            # JSON records may hold numbers, booleans, lists or objects here
+            if isinstance(value, datetime):
+                value = value.replace(tzinfo=None)
+            elif not isinstance(value, str):
+                return None, {name: ['Not a valid datetime value']}
+            else:
+                try:
+                    value = date_parser.parse(value).replace(tzinfo=None)
+                except (ValueError, OverflowError):
+                    return None, {name: ['Not a valid datetime value']}
+        values[name] = value
+    if entity == 'shows' and values.get('end_time') is None and values.get('start_time') is not None:
+        values['end_time'] = values['start_time'] + DEFAULT_SHOW_DURATION
+
+    formdata = MultiDict()
+    for name, value in values.items():
+        if name == 'genres' and value:
+            for genre in value:
+                formdata.add(name, genre)
+        elif name in BOOLEANS:
+            formdata.add(name, 't' if value else '')
+        elif name in DATETIMES and value is not None:
+            formdata.add(name, value.strftime('%Y-%m-%d %H:%M:%S'))
+        elif value is not None:
+            formdata.add(name, str(value))
+
+    form = ENTITIES[entity]['form'](formdata=formdata, meta={'csrf': False})
+    form.validate()
+    errors = {name: messages for name, messages in form.errors.items()
+              if not (name in BLANK_ALLOWED and not values.get(name))}
+    id_fields = ['venue_id', 'artist_id'] if entity == 'shows' else []
+    if 'id' in record:
+        id_fields.append('id')
+    for name in id_fields:
+        try:
+            values[name] = int(values.get(name))
+        except (TypeError, ValueError):
+            errors[name] = ['Not a valid id']
+
+    return values, errors
+
+
+def copy_value(value):
+    """Render a value for COPY ... CSV, where an unquoted empty field is NULL"""
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return '{' + ','.join('"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"' for v in value) + '}'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value)
+
+
+def existing_ids(cursor, table, ids):
+    if not ids:
+        return set()
+    cursor.execute(f'SELECT id FROM {table} WHERE id = ANY(%s)', (list(ids),))
+    return {row[0] for row in cursor}
+
+
+def copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_value(value) for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def reserve_ids(cursor, table, count):
+    """Draw `count` ids from the table's sequence, so association rows can be written alongside"""
+    cursor.execute(f"SELECT nextval(pg_get_serial_sequence('{table}', 'id')) FROM generate_series(1, %s)",
+                   (count,))
+    return [row[0] for row in cursor]
+
+
+def write_genres(cursor, entity, batch):
+    """Create the batch's missing genres and COPY its association rows"""
+    association, fk = TAGGED[entity]
+    names = sorted({genre for _, values in batch for genre in values.get('genres') or []})
+    if not names:
+        return
+    cursor.execute('INSERT INTO genres (name) SELECT unnest(%s::varchar[]) ON CONFLICT (name) DO NOTHING',
+                   (names,))
+    cursor.execute('SELECT name, id FROM genres WHERE name = ANY(%s)', (names,))
+    genre_ids = dict(cursor.fetchall())
+    copy_rows(cursor, association, [fk, 'genre_id'],
+              ((values['id'], genre_ids[genre])
+               for _, values in batch for genre in sorted(set(values.get('genres') or []))))
+
+
+def insert_each(cursor, entity, columns, batch):
+    """Insert a batch row by row, rejecting the rows that overlap a booking"""
+    inserted, rejected = [], []
+    statement = f'INSERT INTO {entity} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))})'
+    for line, values in batch:
+        cursor.execute('SAVEPOINT booking')
+        try:
+            cursor.execute(statement, [values.get(column) for column in columns])
+        except Exception as e:
+            if getattr(e, 'pgcode', None) != EXCLUSION_VIOLATION:
+                raise
+            cursor.execute('ROLLBACK TO SAVEPOINT booking')
+            rejected.append((line, {'start_time': ['Overlaps another show of the venue or the artist']}))
+        else:
+            cursor.execute('RELEASE SAVEPOINT booking')
+            inserted.append((line, values))
+    return inserted, rejected
+
+
+def write_batch(connection, entity, columns, batch):
+    """COPY one batch of cleaned records, dropping shows with unknown venue/artist.
+
+    Nothing is committed: the caller commits once every batch is written.
+    """
+    cursor = connection.cursor()
+    rejected = []
+    if entity == 'shows':
+        venues = existing_ids(cursor, 'venues', {values['venue_id'] for _, values in batch})
+        artists = existing_ids(cursor, 'artists', {values['artist_id'] for _, values in batch})
+        resolved = []
+        for line, values in batch:
+            if values['venue_id'] not in venues:
+                rejected.append((line, {'venue_id': [f"Unknown venue {values['venue_id']}"]}))
+            elif values['artist_id'] not in artists:
+                rejected.append((line, {'artist_id': [f"Unknown artist {values['artist_id']}"]}))
+            else:
+                resolved.append((line, values))
+        batch = resolved
+
+    if entity in TAGGED:
+        missing = [values for _, values in batch if values.get('id') is None]
+        for values, entity_id in zip(missing, reserve_ids(cursor, entity, len(missing)) if missing else []):
+            values['id'] = entity_id
+        columns = ['id'] + [column for column in columns if column not in ('id', 'genres')]
+
+    cursor.execute('SAVEPOINT batch')
+    try:
+        copy_rows(cursor, entity, columns, ([values.get(column) for column in columns] for _, values in batch))
+    except Exception as e:
+        if getattr(e, 'pgcode', None) != EXCLUSION_VIOLATION:
+            raise
+        # A double booking fails the whole COPY: find the culprits one row at a time
+        cursor.execute('ROLLBACK TO SAVEPOINT batch')
+        batch, conflicts = insert_each(cursor, entity, columns, batch)
+        rejected.extend(conflicts)
+    cursor.execute('RELEASE SAVEPOINT batch')
+    if entity in TAGGED:
+        write_genres(cursor, entity, batch)
+    cursor.close()
+    return len(batch), rejected
+
+
+def reset_sequences(connection):
+    """Move the id sequences past rows imported with explicit ids, and commit the import"""
+    cursor = connection.cursor()
+    for table in ENTITIES:
+        cursor.execute(f"""
+            SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1), max(id) IS NOT NULL)
+            FROM {table}
+        """)
+    connection.commit()
+    cursor.close()
+
+
+def import_file(entity, path, batch_size=10000, echo=print):
+    """Import `path` into `entity` ('venues', 'artists' or 'shows').
+
+    Rejected records are reported through `echo` as they are found. The
+    records are committed together at the end; a failure keeps none of them.
+    Returns the number of imported and rejected records.
+    """
+    columns = ENTITIES[entity]['columns']
+    records = read_records(path)
+    first = next(records, None)
+    if first is None:
+        return 0, 0
+    # Keep the file's ids when it provides them
+    if 'id' in first:
+        columns = ['id'] + columns
+
+    connection = db.engine.raw_connection()
+    imported, rejected, batch = 0, 0, []
+    started = time.perf_counter()
+
+    def reject(line, errors):
+        nonlocal rejected
+        rejected += 1
+        echo(f'{entity}: record {line} rejected: {errors}')
+
+    def flush():
+        nonlocal imported
+        count, batch_rejected = write_batch(connection, entity, columns, batch)
+        imported += count
+        for line, errors in batch_rejected:
+            reject(line, errors)
+        del batch[:]
+        elapsed = time.perf_counter() - started
+        echo(f'{entity}: {imported} rows written ({imported / elapsed:.0f} rows/sec)')
+
+    try:
+        for line, record in enumerate(chain([first], records), start=1):
+            values, errors = clean(entity, record)
+            if errors:
+                reject(line, errors)
+                continue
+            batch.append((line, values))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        reset_sequences(connection)
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    if entity == 'shows':
+        Venue.refresh_show_counts()
+        Artist.refresh_show_counts()
+        db.session.commit()
+
+    return imported, rejected
+
@@ -0,0 +1,255 @@
+from bisect import bisect_left
+from threading import Lock
+from uuid import uuid4
+import glob
+import json
+import os
+import time
+
+from flask import current_app, g, request, has_request_context, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Statements longer than this are cut short in the slowest-statement label
+STATEMENT_LABEL_LENGTH = 200
+# A worker writes its metrics to METRICS_DIR at most this often (seconds)
+FLUSH_INTERVAL = 1
+
+
+def label_value(text):
+    """Escape a Prometheus label value, on one line"""
+    text = ' '.join(text.split())[:STATEMENT_LABEL_LENGTH]
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per endpoint"""
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, endpoint, value):
+        counts, total = self.series.get(endpoint, ([0] * (len(self.buckets) + 1), 0))
+        counts[bisect_left(self.buckets, value)] += 1
+        self.series[endpoint] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for endpoint, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{endpoint="{endpoint}"}} {total}')
+            lines.append(f'{self.name}_count{{endpoint="{endpoint}"}} {cumulative}')
+        return '\n'.join(lines)
+
+    def merge(self, series):
+        """Add the series of another process"""
+        for endpoint, (counts, total) in series.items():
+            own, own_total = self.series.get(endpoint, ([0] * (len(self.buckets) + 1), 0))
+            self.series[endpoint] = ([a + b for a, b in zip(own, counts)], own_total + total)
+
+
+class Counter:
+    """Prometheus-style counter, one series per value of `label`"""
+
+    def __init__(self, name, help, label):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.series = {}
+        self.lock = Lock()
+
+    def inc(self, value, amount=1):
+        with self.lock:
+            self.series[value] = self.series.get(value, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{{{self.label}="{value}"}} {count}' for value, count in sorted(self.series.items())]
+        return '\n'.join(lines)
+
+    def merge(self, series):
+        for value, count in series.items():
+            self.inc(value, count)
+
+
+class QueryMetrics:
+    """Counts and times the SQL each request issues.
+
+    Per request: query count, total DB time and the slowest statement, exposed
+    as a Server-Timing header and aggregated per endpoint on /metrics, along
+    with the slowest statement each endpoint has run.
+    Requests slower than SLOW_REQUEST_MS are logged with their statements.
+
+    Each process counts on its own. With METRICS_DIR set (gunicorn.conf.py
+    does), every worker writes its totals to a file of its own there and
+    /metrics sums the files of all workers, past ones included, so the
+    series stay monotonic whichever worker answers the scrape.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.slow_request_ms = None
+        self.request_duration = Histogram(
+            'fyyur_request_duration_seconds', 'Request duration.', DURATION_BUCKETS)
+        self.db_time = Histogram(
+            'fyyur_db_time_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS)
+        self.db_queries = Histogram(
+            'fyyur_db_queries', 'SQL statements per request.', QUERY_BUCKETS)
+        self.histograms = (self.request_duration, self.db_time, self.db_queries)
+        # endpoint -> (seconds, statement) of the slowest statement seen
+        self.slowest = {}
+        # Other components' counters, see counter()
+        self.counters = {}
+        self.directory = None
+        self.path = None
+        self.path_pid = None
+        self.flushed_at = 0
+
+    def init_app(self, app):
+        self.slow_request_ms = app.config.get('SLOW_REQUEST_MS')
+        self.directory = app.config.get('METRICS_DIR')
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        # Engine-wide listeners: register once however many apps are created
+        if not event.contains(Engine, 'before_cursor_execute', self.before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+            event.listen(Engine, 'handle_error', self.handle_error)
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def handle_error(self, context):
+        # after_cursor_execute does not run for a failed statement
+        if context.connection is not None and context.cursor is not None:
+            starts = context.connection.info.get('query_start')
+            if starts:
+                starts.pop()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if not has_request_context() or 'sql' not in g:
+            return
+        sql = g.sql
+        sql['count'] += 1
+        sql['time'] += elapsed
+        if elapsed > sql['slowest'][0]:
+            sql['slowest'] = (elapsed, statement)
+        if self.slow_request_ms is not None:
+            sql['statements'].append((elapsed, statement))
+
+    def before_request(self):
+        g.request_start = time.perf_counter()
+        g.sql = {'count': 0, 'time': 0.0, 'slowest': (0.0, None), 'statements': []}
+
+    def after_request(self, response):
+        if 'sql' not in g:
+            return response
+        duration = time.perf_counter() - g.request_start
+        sql = g.sql
+        endpoint = request.endpoint or 'unknown'
+
+        with self.lock:
+            self.request_duration.observe(endpoint, duration)
+            self.db_time.observe(endpoint, sql['time'])
+            self.db_queries.observe(endpoint, sql['count'])
+            if sql['slowest'][1] is not None and sql['slowest'][0] > self.slowest.get(endpoint, (0.0,))[0]:
+                self.slowest[endpoint] = sql['slowest']
+        if self.directory and time.monotonic() - self.flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+        response.headers.add('Server-Timing', f'db;dur={sql["time"] * 1000:.1f};desc="{sql["count"]} queries"')
+        response.headers.add('Server-Timing', f'total;dur={duration * 1000:.1f}')
+
+        if self.slow_request_ms is not None and duration * 1000 > self.slow_request_ms:
+            current_app.logger.warning(
+                'Slow request %s %s: %.1f ms, %d queries, %.1f ms in SQL, slowest %.1f ms\n%s',
+                request.method, request.path, duration * 1000, sql['count'], sql['time'] * 1000,
+                sql['slowest'][0] * 1000,
+                '\n'.join(f'  {elapsed * 1000:.1f} ms  {statement}' for elapsed, statement in sql['statements']))
+        return response
+
+    def counter(self, name, help, label):
+        """The Counter `name`, created and added to /metrics on first use"""
+        if name not in self.counters:
+            self.counters[name] = Counter(name, help, label)
+        return self.counters[name]
+
+    def state(self):
+        """This process's totals, as JSON-serializable data"""
+        with self.lock:
+            state = {'histograms': {histogram.name: {endpoint: (list(counts), total)
+                                                     for endpoint, (counts, total) in histogram.series.items()}
+                                    for histogram in self.histograms},
+                     'slowest': dict(self.slowest)}
+        state['counters'] = {}
+        for counter in self.counters.values():
+            with counter.lock:
+                state['counters'][counter.name] = dict(counter.series)
+        return state
+
+    def flush(self):
+        """Write this process's totals to its own file in METRICS_DIR"""
+        # A file per process lifetime: a later process reusing the pid starts from zero
+        if self.path_pid != os.getpid():
+            self.path_pid = os.getpid()
+            self.path = os.path.join(self.directory, f'{self.path_pid}-{uuid4().hex[:8]}.json')
+        self.flushed_at = time.monotonic()
+        partial = self.path + '.tmp'
+        with open(partial, 'w') as f:
+            json.dump(self.state(), f)
+        os.replace(partial, self.path)
+
+    def states(self):
+        if not self.directory:
+            return [self.state()]
+        self.flush()
+        states = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return states
+
+    def render(self):
+        """Prometheus exposition of the per-endpoint histograms and the counters, summed over workers"""
+        histograms = {histogram.name: Histogram(histogram.name, histogram.help, histogram.buckets)
+                      for histogram in self.histograms}
+        counters = {counter.name: Counter(counter.name, counter.help, counter.label)
+                    for counter in self.counters.values()}
+        slowest = {}
+        for state in self.states():
+            for name, series in state['histograms'].items():
+                histograms[name].merge(series)
+            for name, series in state['counters'].items():
+                if name in counters:
+                    counters[name].merge(series)
+            for endpoint, (seconds, statement) in state['slowest'].items():
+                if seconds > slowest.get(endpoint, (0.0,))[0]:
+                    slowest[endpoint] = (seconds, statement)
+
+        body = '\n'.join(histogram.render() for histogram in histograms.values())
+        body += '\n# HELP fyyur_slowest_query_seconds Slowest SQL statement run by the endpoint.'
+        body += '\n# TYPE fyyur_slowest_query_seconds gauge'
+        for endpoint, (seconds, statement) in sorted(slowest.items()):
+            body += (f'\nfyyur_slowest_query_seconds{{endpoint="{endpoint}",'
+                     f'statement="{label_value(statement)}"}} {seconds}')
+        for counter in counters.values():
+            body += '\n' + counter.render()
+        return Response(body + '\n', mimetype='text/plain; version=0.0.4')
+
+
+query_metrics = QueryMetrics()
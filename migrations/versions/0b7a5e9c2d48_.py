@@ -0,0 +1,37 @@
+"""venue_directory materialized view
+
+Revision ID: 0b7a5e9c2d48
+Revises: f29d6c3a8e15
+Create Date: 2026-10-18 14:22:08.315570
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7a5e9c2d48'
+down_revision = 'f29d6c3a8e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('''
+        CREATE MATERIALIZED VIEW venue_directory AS
+        SELECT venues.id, venues.name, venues.city, venues.state,
+               coalesce(upcoming.count, 0)::integer AS num_upcoming_shows
+        FROM venues
+        LEFT JOIN (
+            SELECT venue_id, count(*) AS count FROM shows
+            WHERE start_time > localtimestamp
+            GROUP BY venue_id
+        ) upcoming ON upcoming.venue_id = venues.id
+    ''')
+    # The unique index is what allows REFRESH ... CONCURRENTLY
+    op.create_index('ix_venue_directory_id', 'venue_directory', ['id'], unique=True)
+    op.create_index('ix_venue_directory_area', 'venue_directory', ['state', 'city', 'name'], unique=False)
+
+
+def downgrade():
+    op.execute('DROP MATERIALIZED VIEW venue_directory')
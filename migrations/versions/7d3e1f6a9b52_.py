@@ -0,0 +1,70 @@
+"""normalized genres with venue/artist association tables
+
+Revision ID: 7d3e1f6a9b52
+Revises: 0b7a5e9c2d48
+Create Date: 2026-10-18 16:05:41.208934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3e1f6a9b52'
+down_revision = '0b7a5e9c2d48'
+branch_labels = None
+depends_on = None
+
+ASSOCIATIONS = (('venues', 'venue_genres', 'venue_id'), ('artists', 'artist_genres', 'artist_id'))
+
+
+def upgrade():
+    op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, association, fk in ASSOCIATIONS:
+        op.create_table(association,
+        sa.Column(fk, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([fk], [f'{table}.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ),
+        sa.PrimaryKeyConstraint(fk, 'genre_id')
+        )
+        # The primary key serves lookups by entity, this one serves filtering by genre
+        op.create_index(f'ix_{association}_genre_id_{fk}', association, ['genre_id', fk], unique=False)
+
+    op.execute('''
+        INSERT INTO genres (name)
+        SELECT DISTINCT unnest(genres) FROM venues
+        UNION
+        SELECT DISTINCT unnest(genres) FROM artists
+    ''')
+    for table, association, fk in ASSOCIATIONS:
+        op.execute(f'''
+            INSERT INTO {association} ({fk}, genre_id)
+            SELECT DISTINCT {table}.id, genres.id
+            FROM {table}, unnest({table}.genres) AS tagged(name)
+            JOIN genres ON genres.name = tagged.name
+        ''')
+        op.drop_column(table, 'genres')
+
+
+def downgrade():
+    for table, association, fk in ASSOCIATIONS:
+        op.add_column(table, sa.Column('genres', postgresql.ARRAY(sa.String()), nullable=True))
+        op.execute(f'''
+            UPDATE {table} SET genres = tagged.names
+            FROM (
+                SELECT {association}.{fk}, array_agg(genres.name ORDER BY genres.name) AS names
+                FROM {association} JOIN genres ON genres.id = {association}.genre_id
+                GROUP BY {association}.{fk}
+            ) tagged
+            WHERE tagged.{fk} = {table}.id
+        ''')
+        op.drop_index(f'ix_{association}_genre_id_{fk}', table_name=association)
+        op.drop_table(association)
+    op.drop_table('genres')
@@ -0,0 +1,57 @@
+"""reject cross-month overlapping shows with a trigger on the shows parent
+
+Revision ID: a6c2e4f81b07
+Revises: f3b6d9e2a7c4
+Create Date: 2026-10-18 21:12:05.318472
+
+The per-partition exclusion constraints cannot see a show running into the
+next month's partition. This trigger checks such shows, and the shows starting
+within 24 hours (the longest show) of a month start, against every partition
+under the venue and artist advisory locks. It fires for INSERT, UPDATE and
+COPY alike. AFTER row triggers on a partitioned table need PostgreSQL 11+.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c2e4f81b07'
+down_revision = 'f3b6d9e2a7c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('''
+        CREATE FUNCTION shows_check_month_boundary() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            month_start timestamp := date_trunc('month', NEW.start_time);
+        BEGIN
+            -- Entirely inside one partition: its exclusion constraints decide
+            IF NEW.end_time <= month_start + interval '1 month'
+               AND NEW.start_time >= month_start + interval '24 hours' THEN
+                RETURN NULL;
+            END IF;
+            -- Same locks as Show.create_batch; held until the transaction ends, so
+            -- a concurrent booking across the boundary waits and then sees this row
+            PERFORM pg_advisory_xact_lock(1, NEW.venue_id), pg_advisory_xact_lock(2, NEW.artist_id);
+            IF EXISTS (SELECT 1 FROM shows
+                       WHERE (venue_id = NEW.venue_id OR artist_id = NEW.artist_id) AND id <> NEW.id
+                       AND start_time > NEW.start_time - interval '24 hours'
+                       AND start_time < NEW.end_time AND end_time > NEW.start_time) THEN
+                RAISE EXCEPTION 'show % overlaps another show of venue % or artist %',
+                    NEW.id, NEW.venue_id, NEW.artist_id
+                    USING ERRCODE = 'exclusion_violation';
+            END IF;
+            RETURN NULL;
+        END $$
+    ''')
+    op.execute('''
+        CREATE TRIGGER shows_month_boundary
+        AFTER INSERT OR UPDATE OF venue_id, artist_id, start_time, end_time ON shows
+        FOR EACH ROW EXECUTE PROCEDURE shows_check_month_boundary()
+    ''')
+
+
+def downgrade():
+    op.execute('DROP TRIGGER shows_month_boundary ON shows')
+    op.execute('DROP FUNCTION shows_check_month_boundary()')
@@ -0,0 +1,30 @@
+"""venue coordinates with an earthdistance index
+
+Revision ID: b8c4a2f7e361
+Revises: 7d3e1f6a9b52
+Create Date: 2026-10-18 17:12:30.441872
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8c4a2f7e361'
+down_revision = '7d3e1f6a9b52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS cube')
+    op.execute('CREATE EXTENSION IF NOT EXISTS earthdistance')
+    op.add_column('venues', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venues', sa.Column('longitude', sa.Float(), nullable=True))
+    op.execute('CREATE INDEX ix_venues_location ON venues USING gist (ll_to_earth(latitude, longitude))')
+
+
+def downgrade():
+    op.drop_index('ix_venues_location', table_name='venues')
+    op.drop_column('venues', 'longitude')
+    op.drop_column('venues', 'latitude')
@@ -0,0 +1,33 @@
+"""denormalized show counters on venues and artists
+
+Revision ID: c71e0b94d5a2
+Revises: a5d2e81c4f37
+Create Date: 2026-10-18 11:48:05.130264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71e0b94d5a2'
+down_revision = 'a5d2e81c4f37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, fk in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.execute(f'''
+            UPDATE {table} SET
+                upcoming_shows_count = (SELECT count(*) FROM shows WHERE shows.{fk} = {table}.id AND shows.start_time > localtimestamp),
+                past_shows_count = (SELECT count(*) FROM shows WHERE shows.{fk} = {table}.id AND shows.start_time <= localtimestamp)
+        ''')
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
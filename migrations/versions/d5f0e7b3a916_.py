@@ -0,0 +1,70 @@
+"""show end times and per-partition booking exclusion constraints
+
+Revision ID: d5f0e7b3a916
+Revises: b8c4a2f7e361
+Create Date: 2026-10-18 18:03:52.776104
+
+Existing shows get a two hour end time. The exclusion constraints cannot be
+added while a venue or an artist has overlapping shows, so resolve those
+first; this lists them:
+
+    SELECT a.id, b.id FROM shows a JOIN shows b ON a.id < b.id
+    AND (a.venue_id = b.venue_id OR a.artist_id = b.artist_id)
+    AND tsrange(a.start_time, a.end_time) && tsrange(b.start_time, b.end_time)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f0e7b3a916'
+down_revision = 'b8c4a2f7e361'
+branch_labels = None
+depends_on = None
+
+PARTITIONS = '''
+    SELECT child.relname FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = 'shows'
+'''
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute("UPDATE shows SET end_time = start_time + interval '2 hours'")
+    op.alter_column('shows', 'end_time', nullable=False)
+    op.create_check_constraint('ck_shows_duration', 'shows',
+                               "end_time > start_time AND end_time <= start_time + interval '24 hours'")
+
+    # Exclusion constraints are not supported on the partitioned parent
+    op.execute(f'''
+        DO $$
+        DECLARE name text;
+        BEGIN
+            FOR name IN {PARTITIONS} LOOP
+                EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist '
+                               '(venue_id WITH =, tsrange(start_time, end_time) WITH &&)',
+                               name, name || '_venue_id_no_overlap');
+                EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist '
+                               '(artist_id WITH =, tsrange(start_time, end_time) WITH &&)',
+                               name, name || '_artist_id_no_overlap');
+            END LOOP;
+        END $$
+    ''')
+
+
+def downgrade():
+    op.execute(f'''
+        DO $$
+        DECLARE name text;
+        BEGIN
+            FOR name IN {PARTITIONS} LOOP
+                EXECUTE format('ALTER TABLE %I DROP CONSTRAINT IF EXISTS %I', name, name || '_venue_id_no_overlap');
+                EXECUTE format('ALTER TABLE %I DROP CONSTRAINT IF EXISTS %I', name, name || '_artist_id_no_overlap');
+            END LOOP;
+        END $$
+    ''')
+    op.drop_constraint('ck_shows_duration', 'shows', type_='check')
+    op.drop_column('shows', 'end_time')
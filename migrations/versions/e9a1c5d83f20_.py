@@ -0,0 +1,40 @@
+"""precomputed artist similarities and job bookkeeping
+
+Revision ID: e9a1c5d83f20
+Revises: d5f0e7b3a916
+Create Date: 2026-10-18 18:47:05.902314
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a1c5d83f20'
+down_revision = 'd5f0e7b3a916'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('artist_similarities',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('similar_artist_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['similar_artist_id'], ['artists.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'similar_artist_id')
+    )
+    op.create_index('ix_artist_similarities_similar_artist_id', 'artist_similarities', ['similar_artist_id'], unique=False)
+    op.create_table('job_runs',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('job_runs')
+    op.drop_index('ix_artist_similarities_similar_artist_id', table_name='artist_similarities')
+    op.drop_table('artist_similarities')
@@ -0,0 +1,99 @@
+"""partition shows by month of start_time
+
+Revision ID: f29d6c3a8e15
+Revises: e4b8f2a61c93
+Create Date: 2026-10-18 13:41:19.627730
+
+Requires PostgreSQL 11+. The primary key becomes (id, start_time) since a
+partitioned table's keys must include the partition key; ids still come from
+shows_id_seq. Shows without a start_time cannot be partitioned and are dropped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f29d6c3a8e15'
+down_revision = 'e4b8f2a61c93'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_shows_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_shows_start_time_id', ['start_time', 'id']),
+    ('ix_shows_updated_at', ['updated_at']),
+]
+
+
+def upgrade():
+    op.rename_table('shows', 'shows_unpartitioned')
+    op.execute('ALTER TABLE shows_unpartitioned RENAME CONSTRAINT shows_pkey TO shows_unpartitioned_pkey')
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='shows_unpartitioned')
+
+    op.execute('''
+        CREATE TABLE shows (
+            id integer NOT NULL DEFAULT nextval('shows_id_seq'),
+            artist_id integer NOT NULL REFERENCES artists (id),
+            venue_id integer NOT NULL REFERENCES venues (id),
+            start_time timestamp NOT NULL,
+            updated_at timestamp NOT NULL DEFAULT LOCALTIMESTAMP,
+            CONSTRAINT shows_pkey PRIMARY KEY (id, start_time)
+        ) PARTITION BY RANGE (start_time)
+    ''')
+    op.execute('CREATE TABLE shows_default PARTITION OF shows DEFAULT')
+
+    # One partition per month from the oldest show to a year from now
+    op.execute('''
+        DO $$
+        DECLARE month date;
+        BEGIN
+            FOR month IN SELECT generate_series(
+                date_trunc('month', least(coalesce(min(start_time), localtimestamp), localtimestamp)),
+                date_trunc('month', greatest(coalesce(max(start_time), localtimestamp), localtimestamp)) + interval '12 months',
+                interval '1 month')::date FROM shows_unpartitioned
+            LOOP
+                EXECUTE format('CREATE TABLE %I PARTITION OF shows FOR VALUES FROM (%L) TO (%L)',
+                               'shows_' || to_char(month, 'YYYY_MM'), month, month + interval '1 month');
+            END LOOP;
+        END $$
+    ''')
+
+    op.execute('''
+        INSERT INTO shows (id, artist_id, venue_id, start_time, updated_at)
+        SELECT id, artist_id, venue_id, start_time, updated_at FROM shows_unpartitioned
+        WHERE start_time IS NOT NULL
+    ''')
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+    op.drop_table('shows_unpartitioned')
+
+    for name, columns in INDEXES:
+        op.create_index(name, 'shows', columns, unique=False)
+
+
+def downgrade():
+    op.rename_table('shows', 'shows_partitioned')
+    op.execute('ALTER TABLE shows_partitioned RENAME CONSTRAINT shows_pkey TO shows_partitioned_pkey')
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='shows_partitioned')
+
+    op.create_table('shows',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('shows_id_seq')"), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('LOCALTIMESTAMP'), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('''
+        INSERT INTO shows (id, artist_id, venue_id, start_time, updated_at)
+        SELECT id, artist_id, venue_id, start_time, updated_at FROM shows_partitioned
+    ''')
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+    op.drop_table('shows_partitioned')
+
+    for name, columns in INDEXES:
+        op.create_index(name, 'shows', columns, unique=False)
@@ -0,0 +1,28 @@
+"""deletion timestamps for conditional GET
+
+Revision ID: f3b6d9e2a7c4
+Revises: e9a1c5d83f20
+Create Date: 2026-10-18 19:26:44.187350
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b6d9e2a7c4'
+down_revision = 'e9a1c5d83f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('deletions',
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade():
+    op.drop_table('deletions')
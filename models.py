@@ -1,18 +1,387 @@
-from flask_sqlalchemy import SQLAlchemy
+from flask import abort
 from flask_migrate import Migrate
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import Counter
+from itertools import groupby
+import base64
+import json
 import sys
 
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.sql.operators import startswith_op
 
-db = SQLAlchemy()
+from autocomplete import name_index
+from cache import cache
+from directory import area_directory
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
 migrate = Migrate()
 
+# Shows submitted without an end time last this long
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+# Upper bound enforced by the ck_shows_duration constraint
+MAX_SHOW_DURATION = timedelta(hours=24)
+
+
+class BookingConflict(Exception):
+    """The venue or the artist already has a show overlapping the requested time"""
+
+# Materialized view behind the /venues directory, refreshed by directory.area_directory.
+# Kept out of db.metadata so create_all and autogenerate leave it to its migration.
+venue_directory = db.Table('venue_directory', db.MetaData(),
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('name', db.String),
+    db.Column('city', db.String),
+    db.Column('state', db.String),
+    db.Column('num_upcoming_shows', db.Integer))
+
+
+def split_shows(query, serialize, now, past_limit=None):
+    """Past and upcoming shows of a query on Show, fetched in one query and split in one pass.
+
+    Each row passes through `serialize`. Window functions count both sides and
+    number the past shows from the most recent, so the database applies the
+    `past_limit` cap and long histories are never fetched.
+    """
+    is_upcoming = Show.start_time >= now
+    upcoming = is_upcoming.label('upcoming')
+    total = db.func.count().over(partition_by=is_upcoming).label('total')
+    recency = db.func.row_number().over(partition_by=is_upcoming, order_by=Show.start_time.desc()).label('recency')
+    rows = query.add_columns(upcoming, total, recency).from_self()
+    if past_limit is not None:
+        rows = rows.filter(db.or_(upcoming, recency <= past_limit))
+
+    past, upcoming_shows, counts = [], [], {False: 0, True: 0}
+    for *entities, row_upcoming, row_total, _ in rows.order_by(Show.start_time):
+        counts[row_upcoming] = row_total
+        (upcoming_shows if row_upcoming else past).append(serialize(*entities))
+    # Most recent past shows first
+    past.reverse()
+
+    return {
+        "past_shows": past,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": counts[False],
+        "upcoming_shows_count": counts[True]
+    }
+
+
+def search_by_name(model, search_term, limit=None, offset=0, genres=()):
+    """Case-insensitive substring search on name, served by the trigram index.
+
+    Returns the total hit count and each hit's upcoming show count in one query,
+    plus the facet counts of all hits.
+    """
+    pattern = search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    criteria = [model.name.ilike(f'%{pattern}%')] + genre_filter(model, genres)
+    if limit is not None:
+        limit = max(limit, 0)
+    offset = max(offset or 0, 0)
+    hits = db.session.query(
+            model.id, model.name, model.upcoming_shows_count,
+            db.func.count().over().label('total'))\
+        .filter(*criteria)\
+        .order_by(model.name, model.id)\
+        .limit(limit).offset(offset).all()
+
+    if hits:
+        count = hits[0].total
+    elif offset or limit == 0:
+        # A page past the last hit (or an empty one) carries no total
+        count = db.session.query(db.func.count(model.id)).filter(*criteria).scalar()
+    else:
+        count = 0
+
+    return {
+        "count": count,
+        "data": [{
+            "id": hit.id,
+            "name": hit.name,
+            "num_upcoming_shows": hit.upcoming_shows_count
+        } for hit in hits],
+        "facets": facet_counts(model, criteria)
+    }
+
+
+def refresh_show_counts(model, show_fk, ids=None):
+    """Recompute the denormalized upcoming/past show counters from the shows table"""
+    now = datetime.now()
+    upcoming = db.select([db.func.count(Show.id)])\
+        .where(show_fk == model.id).where(Show.start_time > now).as_scalar()
+    past = db.select([db.func.count(Show.id)])\
+        .where(show_fk == model.id).where(Show.start_time <= now).as_scalar()
+
+    query = model.query
+    if ids is not None:
+        if not ids:
+            return 0
+        query = query.filter(model.id.in_(ids))
+    return query.update({
+        model.upcoming_shows_count: upcoming,
+        model.past_shows_count: past
+    }, synchronize_session=False)
+
+
+def filter_start_time(query, start=None, end=None):
+    """Restrict shows to [start, end); lets Postgres prune the other monthly partitions"""
+    if start is not None:
+        query = query.filter(Show.start_time >= start)
+    if end is not None:
+        query = query.filter(Show.start_time < end)
+    return query
+
+
+def month_bounds(moment):
+    """Start of the month holding `moment` and of the month after it"""
+    start = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def default_end_time(context):
+    return context.get_current_parameters()['start_time'] + DEFAULT_SHOW_DURATION
+
+
+def batch_overlaps(shows, field):
+    """(i, j) for each show i of `shows` overlapping an earlier-starting show j with the same `field`.
+
+    One sort and a sweep, keeping the show that ends last so far for the
+    current venue/artist.
+    """
+    ordered = sorted(range(len(shows)), key=lambda i: (getattr(shows[i], field), shows[i].start_time))
+    latest = None
+    for i in ordered:
+        same = latest is not None and getattr(shows[latest], field) == getattr(shows[i], field)
+        if same and shows[i].start_time < shows[latest].end_time:
+            yield i, latest
+        if not same or shows[i].end_time > shows[latest].end_time:
+            latest = i
+
+
+def keyset_column(key):
+    """`key` as it is sorted and compared for keyset pagination.
+
+    Nullable (string) columns are coalesced to '': a NULL would sort last and
+    make the row-value comparison with a cursor unknown, ending the paging.
+    """
+    column = key.expression
+    return db.func.coalesce(key, '') if getattr(column, 'nullable', False) else key
+
+
+def encode_cursor(values):
+    """Opaque, url-safe cursor for a keyset position"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, keys):
+    """Keyset position of a cursor made by encode_cursor; a malformed one is a 400"""
+    def decode(key, value):
+        if value is None:
+            return None
+        if isinstance(key.type, db.DateTime):
+            return datetime.fromisoformat(value)
+        if not isinstance(value, key.type.python_type):
+            raise TypeError(value)
+        return value
+
+    # binascii.Error, JSONDecodeError and bad isoformat strings are all ValueErrors
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        return tuple(decode(key, value) for key, value in zip(keys, values))
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def keyset_page(query, keys, after=None, before=None, per_page=20):
+    """One page of `query` ordered by the `keys` columns, seeking from a cursor.
+
+    Returns the page items plus the cursors of the next and previous pages (or None).
+    """
+    columns = [keyset_column(key) for key in keys]
+
+    def position(cursor):
+        return tuple('' if value is None and column is not key else value
+                     for key, column, value in zip(keys, columns, decode_cursor(cursor, keys)))
+
+    if before:
+        query = query.filter(db.tuple_(*columns) < position(before))\
+            .order_by(*[column.desc() for column in columns])
+    else:
+        if after:
+            query = query.filter(db.tuple_(*columns) > position(after))
+        query = query.order_by(*columns)
+
+    items = query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if before:
+        items.reverse()
+
+    def cursor(item):
+        return encode_cursor([getattr(item, key.key) for key in keys])
+
+    return {
+        "items": items,
+        "next": cursor(items[-1]) if items and (has_more if not before else True) else None,
+        "prev": cursor(items[0]) if items and (has_more if before else bool(after)) else None
+    }
+
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False, unique=True)
+
+    @classmethod
+    def named(cls, name):
+        """The genre called `name`, created if it does not exist yet.
+
+        ON CONFLICT lets two requests introducing the same genre both succeed.
+        """
+        db.session.execute(pg_insert(cls.__table__).values(name=name)
+                           .on_conflict_do_nothing(index_elements=[cls.__table__.c.name]))
+        return cls.query.filter_by(name=name).one()
+
+
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'))
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'))
+
+
+# Written by the offline job in similarity.py, read by Artist.similar()
+artist_similarities = db.Table('artist_similarities',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('similar_artist_id', db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('rank', db.Integer, nullable=False),
+    db.Column('score', db.Float, nullable=False),
+    db.Index('ix_artist_similarities_similar_artist_id', 'similar_artist_id'))
+
+# Start time of each offline job's last complete run, for incremental runs
+job_runs = db.Table('job_runs',
+    db.Column('name', db.String, primary_key=True),
+    db.Column('started_at', db.DateTime, nullable=False))
+
+SIMILARITY_JOB = 'artist-similarity'
+DIRECTORY_JOB = 'venue-directory'
+
+# Time of the latest row deletion per table: updated_at cannot show rows that are gone
+deletions = db.Table('deletions',
+    db.Column('table_name', db.String, primary_key=True),
+    db.Column('deleted_at', db.DateTime, nullable=False))
+
+
+def job_run(name, started_at):
+    """Statement recording a complete run of the job `name` started at `started_at`"""
+    return pg_insert(job_runs).values(name=name, started_at=started_at)\
+        .on_conflict_do_update(index_elements=[job_runs.c.name], set_={'started_at': started_at})
+
+
+def record_deletion(*tables):
+    now = datetime.now()
+    for table in tables:
+        db.session.execute(pg_insert(deletions).values(table_name=table, deleted_at=now)
+                           .on_conflict_do_update(index_elements=[deletions.c.table_name], set_={'deleted_at': now}))
+
+
+def last_job_run(name):
+    return db.select([job_runs.c.started_at]).where(job_runs.c.name == name).as_scalar()
+
+
+def last_deletion(table):
+    return db.select([deletions.c.deleted_at]).where(deletions.c.table_name == table).as_scalar()
+
+
+def latest(column, *criteria):
+    """Scalar subquery of the greatest value of `column` among the rows matching `criteria`"""
+    query = db.select([db.func.max(column)])
+    if criteria:
+        query = query.where(db.and_(*criteria))
+    return query.as_scalar()
+
+
+def page_version(model, entity_id, show_fk, other, other_fk, *markers):
+    """Change markers of a venue or artist page, read in one indexed query.
+
+    The entity's and its shows' updated_at, the latest show start already
+    passed (the upcoming/past split moves with time), the linked entities'
+    updated_at and the latest show deletion. None for an unknown entity.
+    """
+    now = datetime.now()
+    return db.session.query(
+            model.updated_at,
+            latest(Show.updated_at, show_fk == entity_id),
+            latest(Show.start_time, show_fk == entity_id, Show.start_time <= now),
+            latest(other.updated_at, other.id.in_(db.select([other_fk]).where(show_fk == entity_id))),
+            last_deletion('shows'),
+            *markers)\
+        .filter(model.id == entity_id).first()
+
+
+def genre_filter(model, genres):
+    """Criteria keeping the entities tagged with every genre in `genres`"""
+    return [model.genre_objects.any(Genre.name == genre) for genre in genres]
+
+
+def genre_names(model):
+    """Correlated array of an entity's genre names, for column-wise queries"""
+    association = venue_genres if model.__tablename__ == 'venues' else artist_genres
+    fk = association.c.venue_id if model.__tablename__ == 'venues' else association.c.artist_id
+    return db.select([db.func.array_agg(Genre.name)])\
+        .where(Genre.id == association.c.genre_id)\
+        .where(fk == model.id).as_scalar().label('genres')
+
+
+def facet_counts(model, criteria=()):
+    """Entity counts per genre, state and seeking flag, in one GROUPING SETS query"""
+    association = venue_genres if model.__tablename__ == 'venues' else artist_genres
+    fk = association.c.venue_id if model.__tablename__ == 'venues' else association.c.artist_id
+    seeking = model.seeking_talent if model.__tablename__ == 'venues' else model.seeking_venue
+
+    matching = db.session.query(model.id, model.state, seeking.label('seeking'))\
+        .filter(*criteria).subquery()
+    rows = db.session.query(
+            Genre.name, matching.c.state, matching.c.seeking,
+            db.func.grouping(Genre.name, matching.c.state, matching.c.seeking).label('grouping'),
+            db.func.count(db.distinct(matching.c.id)))\
+        .select_from(matching)\
+        .outerjoin(association, fk == matching.c.id)\
+        .outerjoin(Genre, Genre.id == association.c.genre_id)\
+        .group_by(db.func.grouping_sets(
+            db.tuple_(Genre.name), db.tuple_(matching.c.state), db.tuple_(matching.c.seeking)))\
+        .all()
+
+    # grouping() has a bit set for every column the row is NOT grouped by
+    facets = {"genre": {}, "state": {}, "seeking": {}}
+    for genre, state, is_seeking, grouping, count in rows:
+        if grouping == 0b011 and genre is not None:
+            facets["genre"][genre] = count
+        elif grouping == 0b101 and state is not None:
+            facets["state"][state] = count
+        elif grouping == 0b110:
+            facets["seeking"][bool(is_seeking)] = facets["seeking"].get(bool(is_seeking), 0) + count
+    return facets
+
+
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String()))
+    genre_objects = db.relationship('Genre', secondary=venue_genres, lazy='selectin')
+    genres = association_proxy('genre_objects', 'name', creator=Genre.named)
     address = db.Column(db.String())
     city = db.Column(db.String())
     state = db.Column(db.String())
@@ -22,43 +391,39 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String())
     image_link = db.Column(db.String())
+    # Filled from a gazetteer by geocode.geocode_venues(); cleared when city/state change
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # Maintained by Show.create and refresh_show_counts()
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set on create and by update(); drives incremental exports
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.now, server_default=db.text('LOCALTIMESTAMP'))
     shows = db.relationship('Show', backref='venue', lazy='dynamic') 
     # Enabled dynamic to be able to compare between start_time and the current time
 
-    def upcoming_shows(self):
-        shows_filtered = db.session.query(Show, Artist).join(Artist)\
-            .filter(Show.venue_id == self.id)\
-            .filter(Show.start_time > datetime.now()).all()
-
-        upcoming_shows_serialized = [{
-            "artist_id": artist.id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "start_time": str(show.start_time)
-        } for show, artist in shows_filtered]
-        
-        return upcoming_shows_serialized
-
-    def past_shows(self):
-        shows_artists_filtered = db.session.query(Show, Artist).join(Artist)\
-            .filter(Show.venue_id == self.id)\
-            .filter(Show.start_time < datetime.now()).all()
- 
-        past_shows_serialized = [{
-            "artist_id": artist.id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "start_time": str(show.start_time)
-        } for show, artist in shows_artists_filtered]
-
-        return past_shows_serialized
-
-
-    def serialize(self):
-        return {
+    def load_shows(self, past_limit=None, start=None, end=None):
+        shows_artists = filter_start_time(
+            db.session.query(Show, Artist).join(Artist).filter(Show.venue_id == self.id), start, end)
+
+        def serialize(show, artist):
+            return {
+                "show_id": show.id,
+                "artist_id": artist.id,
+                "artist_name": artist.name,
+                "artist_image_link": artist.image_link,
+                "start_time": show.start_time,
+                # Fragment cache key part: changes whenever the tile would
+                "version": max(show.updated_at, artist.updated_at)
+            }
+
+        return split_shows(shows_artists, serialize, datetime.now(), past_limit)
+
+    def serialize(self, past_limit=None, start=None, end=None):
+        data = {
             "id": self.id,
             "name": self.name,
-            "genres": self.genres,
+            "genres": list(self.genres),
             "address": self.address,
             "city": self.city,
             "state": self.state,
@@ -67,35 +432,64 @@ class Venue(db.Model):
             "facebook_link": self.facebook_link,
             "seeking_talent": self.seeking_talent,
             "seeking_description": self.seeking_description,
-            "image_link": self.image_link,
-            "past_shows": self.past_shows(),
-            "upcoming_shows": self.upcoming_shows(),
-            "past_shows_count": len(self.past_shows()),
-            "upcoming_shows_count": len(self.upcoming_shows())
+            "image_link": self.image_link
         }
+        data.update(self.load_shows(past_limit, start, end))
+        return data
+
+    @classmethod
+    def directory_criteria(cls, genres=()):
+        directory = venue_directory.c
+        return [directory.id.in_(
+            db.session.query(venue_genres.c.venue_id)
+                .join(Genre, Genre.id == venue_genres.c.genre_id)
+                .filter(Genre.name == genre)) for genre in genres]
 
     @classmethod
-    def group_by_area(cls):
+    def group_by_area(cls, genres=(), areas=None):
+        """Venues grouped by area (city, state); only the (state, city) `areas` when given"""
         data = []
-        # Distinct Areas -> area = (city, state)
-        areas = db.session.query(cls.city, cls.state)\
-            .group_by(cls.city, cls.state).all()
+        directory = venue_directory.c
+        # Venues with their upcoming show counts, ordered so areas are contiguous
+        state, city = keyset_column(directory.state), keyset_column(directory.city)
+        query = db.session.query(directory.id, directory.name, directory.city, directory.state,
+                                 directory.num_upcoming_shows)\
+            .filter(*cls.directory_criteria(genres))\
+            .order_by(state, city, directory.name)
+        if areas is not None:
+            # NULL never matches IN: compare the coalesced values the pages are cut on
+            query = query.filter(db.tuple_(state, city).in_(
+                [(area_state or '', area_city or '') for area_state, area_city in areas]))
 
         # Grouping
-        for area in areas:
-            venues = cls.query.filter(cls.state==area.state)\
-                .filter(cls.city==area.city).all()
+        for (city, state), venues in groupby(query.yield_per(1000), key=lambda row: (row.city, row.state)):
             data.append({
-                "city": area.city,
-                "state": area.state,
+                "city": city,
+                "state": state,
                 "venues": [{
                         "id": venue.id,
                         "name": venue.name,
-                        "num_upcoming_shows": len(venue.upcoming_shows())
+                        "num_upcoming_shows": venue.num_upcoming_shows
                     } for venue in venues]
             })
         return data
 
+    @classmethod
+    def paginate(cls, after=None, before=None, per_page=20, genres=()):
+        """One keyset page of areas, ordered by state and city, with their venues"""
+        directory = venue_directory.c
+        areas = db.session.query(directory.state, directory.city)\
+            .filter(*cls.directory_criteria(genres))\
+            .group_by(directory.state, directory.city)
+        page = keyset_page(areas, [directory.state, directory.city], after, before, per_page)
+        page["items"] = cls.group_by_area(genres, [(area.state, area.city) for area in page["items"]])\
+            if page["items"] else []
+        return page
+
+    @classmethod
+    def refresh_show_counts(cls, ids=None):
+        return refresh_show_counts(cls, Show.venue_id, ids)
+
     @classmethod
     def create(cls, data):
         error = False
@@ -103,6 +497,9 @@ class Venue(db.Model):
             venue = cls(**data)
             db.session.add(venue)
             db.session.commit()
+            cache.invalidate('venues')
+            area_directory.schedule_refresh()
+            name_index.add('venue', venue.id, venue.name)
             
         except:
             print(sys.exc_info())
@@ -115,21 +512,56 @@ class Venue(db.Model):
         return not error
 
     @classmethod
-    def search(cls, search_term):
-        venues = cls.query.filter(cls.name.ilike(f'%{search_term}%'))
-        return {
-            "count": venues.count(),
-            "data": [{
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": len(venue.upcoming_shows())    
-            } for venue in venues]
-        }
+    def search(cls, search_term, limit=None, offset=0, genres=()):
+        return search_by_name(cls, search_term, limit, offset, genres)
+
+    @classmethod
+    def facets(cls, genres=()):
+        return facet_counts(cls, genre_filter(cls, genres))
+
+    @classmethod
+    def version(cls, venue_id):
+        """Change markers of the venue page, see conditional.py"""
+        return page_version(cls, venue_id, Show.venue_id, Artist, Show.artist_id)
+
+    @classmethod
+    def directory_version(cls):
+        """Change markers of /venues: the directory refresh and the facet columns"""
+        return db.session.query(last_job_run(DIRECTORY_JOB), latest(cls.updated_at), last_deletion('venues')).one()
+
+    @classmethod
+    def near(cls, latitude, longitude, radius, limit=None):
+        """Geocoded venues within `radius` meters of a point, closest first.
+
+        The earth_box test is answered by the ix_venues_location GiST index,
+        the exact distance check then trims the box corners.
+        """
+        origin = db.func.ll_to_earth(latitude, longitude)
+        location = db.func.ll_to_earth(cls.latitude, cls.longitude)
+        distance = db.func.earth_distance(origin, location)
+        hits = db.session.query(cls.id, cls.name, cls.city, cls.state, cls.upcoming_shows_count,
+                                distance.label('distance'))\
+            .filter(db.func.earth_box(origin, radius).op('@>')(location))\
+            .filter(distance <= radius)\
+            .order_by(distance, cls.id)\
+            .limit(limit).all()
+
+        return [{
+            "id": hit.id,
+            "name": hit.name,
+            "city": hit.city,
+            "state": hit.state,
+            "distance": hit.distance,
+            "num_upcoming_shows": hit.upcoming_shows_count
+        } for hit in hits]
 
     def update(self, name, city, state, address, phone, image_link, genres, facebook_link, website, seeking_talent, seeking_description):
         error = False
         try:
             # Updating the available fields in the update form 
+            if (city, state) != (self.city, self.state):
+                # Relocated: drop the stale coordinates until the next geocoding run
+                self.latitude = self.longitude = None
             self.name = name
             self.city = city
             self.state = state
@@ -141,7 +573,10 @@ class Venue(db.Model):
             self.website = website
             self.seeking_talent = bool(seeking_talent)
             self.seeking_description = seeking_description
+            self.updated_at = datetime.now()
             db.session.commit()
+            self.invalidate_cache()
+            name_index.add('venue', self.id, self.name)
         except:
             print(sys.exc_info())
             db.session.rollback()
@@ -151,11 +586,36 @@ class Venue(db.Model):
 
         return not error
 
+    def invalidate_cache(self):
+        """Drop the cached pages that display this venue"""
+        artist_ids = db.session.query(Show.artist_id)\
+            .filter(Show.venue_id == self.id).distinct()
+        cache.invalidate(f'venue:{self.id}', 'venues', 'shows',
+                         *[f'artist:{artist_id}' for artist_id, in artist_ids])
+        area_directory.schedule_refresh()
+
     def delete(self):
         error = False
         try:
+            # Remove the venue's shows and take them off the artists' counters
+            upcoming = Show.start_time > datetime.now()
+            shows = db.session.query(Show.artist_id, upcoming, db.func.count(Show.id))\
+                .filter(Show.venue_id == self.id)\
+                .group_by(Show.artist_id, upcoming).all()
+            for artist_id, is_upcoming, count in shows:
+                counter = Artist.upcoming_shows_count if is_upcoming else Artist.past_shows_count
+                Artist.query.filter(Artist.id == artist_id)\
+                    .update({counter: counter - count}, synchronize_session=False)
+            Show.query.filter(Show.venue_id == self.id).delete(synchronize_session=False)
+            record_deletion('venues', 'shows')
+            venue_id = self.id
             db.session.delete(self)
             db.session.commit()
+            # Only once committed, or a concurrent request could cache the old pages again
+            cache.invalidate(f'venue:{venue_id}', 'venues', 'shows',
+                             *{f'artist:{artist_id}' for artist_id, _, _ in shows})
+            area_directory.schedule_refresh()
+            name_index.remove('venue', venue_id)
         except:
             print(sys.exc_info())
             db.session.rollback()
@@ -166,11 +626,19 @@ class Venue(db.Model):
         return not error
 
 
+# Functional GiST index (cube/earthdistance) behind Venue.near()
+db.Index('ix_venues_location', db.func.ll_to_earth(Venue.latitude, Venue.longitude), postgresql_using='gist')
+
+
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String()))
+    genre_objects = db.relationship('Genre', secondary=artist_genres, lazy='selectin')
+    genres = association_proxy('genre_objects', 'name', creator=Genre.named)
     city = db.Column(db.String())
     state = db.Column(db.String())
     phone = db.Column(db.String())
@@ -179,41 +647,35 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String())
     image_link = db.Column(db.String())
+    # Maintained by Show.create and refresh_show_counts()
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set on create and by update(); drives incremental exports
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.now, server_default=db.text('LOCALTIMESTAMP'))
     shows = db.relationship('Show', backref='artist', lazy='dynamic')
 
-    def upcoming_shows(self):
-        shows_venues_filtered = db.session.query(Show, Venue).join(Venue)\
-            .filter(Show.artist_id == self.id)\
-            .filter(Show.start_time > datetime.now()).all()
-       
-        upcoming_shows_serialized = [{
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "venue_image_link": venue.image_link,
-            "start_time": str(show.start_time)
-        } for show, venue in shows_venues_filtered]
-        
-        return upcoming_shows_serialized
-
-    def past_shows(self):
-        shows_venues_filtered = db.session.query(Show, Venue).join(Venue)\
-            .filter(Show.artist_id == self.id)\
-            .filter(Show.start_time < datetime.now()).all()
-
-        past_shows_serialized = [{
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "venue_image_link": venue.image_link,
-            "start_time": str(show.start_time)
-        } for show, venue in shows_venues_filtered]
-        
-        return past_shows_serialized
-
-    def serialize(self):
-        return {
+    def load_shows(self, past_limit=None, start=None, end=None):
+        shows_venues = filter_start_time(
+            db.session.query(Show, Venue).join(Venue).filter(Show.artist_id == self.id), start, end)
+
+        def serialize(show, venue):
+            return {
+                "show_id": show.id,
+                "venue_id": venue.id,
+                "venue_name": venue.name,
+                "venue_image_link": venue.image_link,
+                "start_time": show.start_time,
+                # Fragment cache key part: changes whenever the tile would
+                "version": max(show.updated_at, venue.updated_at)
+            }
+
+        return split_shows(shows_venues, serialize, datetime.now(), past_limit)
+
+    def serialize(self, past_limit=None, start=None, end=None):
+        data = {
             "id": self.id,
             "name": self.name,
-            "genres": self.genres,
+            "genres": list(self.genres),
             "city": self.city,
             "state": self.state,
             "phone": self.phone,
@@ -221,12 +683,50 @@ class Artist(db.Model):
             "facebook_link": self.facebook_link,
             "seeking_venue": self.seeking_venue,
             "seeking_description": self.seeking_description,
-            "image_link": self.image_link,
-            "past_shows": self.past_shows(),
-            "upcoming_shows": self.upcoming_shows(),
-            "past_shows_count": len(self.past_shows()),
-            "upcoming_shows_count": len(self.upcoming_shows())
+            "image_link": self.image_link
         }
+        data.update(self.load_shows(past_limit, start, end))
+        return data
+
+    @classmethod
+    def version(cls, artist_id):
+        """Change markers of the artist page, similar artists included, see conditional.py"""
+        similar = artist_similarities.c
+        return page_version(cls, artist_id, Show.artist_id, Venue, Show.venue_id,
+                            last_job_run(SIMILARITY_JOB),
+                            latest(Artist.updated_at, Artist.id.in_(
+                                db.select([similar.similar_artist_id]).where(similar.artist_id == artist_id))))
+
+    @classmethod
+    def listing_version(cls):
+        return db.session.query(latest(cls.updated_at), last_deletion('artists')).one()
+
+    def similar(self, limit=None):
+        """Related artists precomputed by similarity.py, most similar first"""
+        similar = artist_similarities.c
+        rows = db.session.query(Artist.id, Artist.name, Artist.image_link, similar.score)\
+            .join(artist_similarities, similar.similar_artist_id == Artist.id)\
+            .filter(similar.artist_id == self.id)\
+            .order_by(similar.rank)\
+            .limit(limit).all()
+
+        return [{
+            "artist_id": row.id,
+            "artist_name": row.name,
+            "artist_image_link": row.image_link,
+            "score": round(row.score, 4)
+        } for row in rows]
+
+    @classmethod
+    def paginate(cls, after=None, before=None, per_page=20, genres=()):
+        query = db.session.query(cls.id, cls.name).filter(*genre_filter(cls, genres))
+        page = keyset_page(query, [cls.name, cls.id], after, before, per_page)
+        page["items"] = [{"id": artist.id, "name": artist.name} for artist in page["items"]]
+        return page
+
+    @classmethod
+    def refresh_show_counts(cls, ids=None):
+        return refresh_show_counts(cls, Show.artist_id, ids)
 
     @classmethod
     def create(cls, data):
@@ -235,6 +735,7 @@ class Artist(db.Model):
             artist = cls(**data)
             db.session.add(artist)
             db.session.commit()
+            name_index.add('artist', artist.id, artist.name)
             
         except:
             print(sys.exc_info())
@@ -247,16 +748,12 @@ class Artist(db.Model):
         return not error
     
     @classmethod
-    def search(cls, search_term):
-        artists = cls.query.filter(cls.name.ilike(f'%{search_term}%'))
-        return {
-            "count": artists.count(),
-            "data": [{
-                "id": artist.id,
-                "name": artist.name,
-                "num_upcoming_shows": len(artist.upcoming_shows())    
-            } for artist in artists]
-        }
+    def search(cls, search_term, limit=None, offset=0, genres=()):
+        return search_by_name(cls, search_term, limit, offset, genres)
+
+    @classmethod
+    def facets(cls, genres=()):
+        return facet_counts(cls, genre_filter(cls, genres))
 
     def update(self, name, city, state, phone, image_link, genres, facebook_link, website, seeking_venue, seeking_description):
         error = False
@@ -272,7 +769,10 @@ class Artist(db.Model):
             self.website = website
             self.seeking_venue = bool(seeking_venue)
             self.seeking_description = seeking_description
+            self.updated_at = datetime.now()
             db.session.commit()
+            self.invalidate_cache()
+            name_index.add('artist', self.id, self.name)
         except:
             print(sys.exc_info())
             db.session.rollback()
@@ -282,23 +782,48 @@ class Artist(db.Model):
 
         return not error
 
+    def invalidate_cache(self):
+        """Drop the cached pages that display this artist"""
+        venue_ids = db.session.query(Show.venue_id)\
+            .filter(Show.artist_id == self.id).distinct()
+        cache.invalidate(f'artist:{self.id}', 'shows',
+                         *[f'venue:{venue_id}' for venue_id, in venue_ids])
+
 
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        db.CheckConstraint("end_time > start_time AND end_time <= start_time + interval '24 hours'",
+                           name='ck_shows_duration'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey(Artist.id), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey(Venue.id), nullable=False)
-    start_time = db.Column(db.DateTime())
+    # Partition key of the monthly range-partitioned shows table
+    start_time = db.Column(db.DateTime(), nullable=False)
+    # Overlapping [start_time, end_time) bookings of a venue or an artist are
+    # rejected by exclusion constraints on each partition (see partitions.py),
+    # and across partitions by the shows_month_boundary trigger
+    end_time = db.Column(db.DateTime(), nullable=False, default=default_end_time)
+    # Set on create; drives incremental exports
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.now, server_default=db.text('LOCALTIMESTAMP'))
 
     def serialize(self):
         return {
+            "show_id": self.id,
             "venue_id": self.venue.id,
             "venue_name": self.venue.name,
             "artist_id": self.artist.id,
             "artist_name": self.artist.name,
             "artist_image_link": self.artist.image_link,
-            "start_time": str(self.start_time)
-        }   
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            # Fragment cache key part: changes whenever the tile would
+            "version": max(self.updated_at, self.venue.updated_at, self.artist.updated_at)
+        }
     
     # def serialize_for_venue(self):
     #     return {
@@ -316,14 +841,164 @@ class Show(db.Model):
     #         "start_time": str(self.start_time)
     #     }
 
+    @classmethod
+    def listing_version(cls):
+        """Change markers of /shows, which also shows venue and artist names and images"""
+        return db.session.query(latest(cls.updated_at), latest(Venue.updated_at), latest(Artist.updated_at),
+                                last_deletion('shows')).one()
+
+    @classmethod
+    def paginate(cls, after=None, before=None, per_page=20, start=None, end=None):
+        query = filter_start_time(cls.query, start, end)\
+            .options(db.joinedload('venue'), db.joinedload('artist'))
+        page = keyset_page(query, [cls.start_time, cls.id], after, before, per_page)
+        page["items"] = [show.serialize() for show in page["items"]]
+        return page
+
+    def increment_show_counts(self):
+        """Count this show on its venue and artist, as upcoming or past"""
+        for model, entity_id in ((Venue, self.venue_id), (Artist, self.artist_id)):
+            counter = model.upcoming_shows_count if self.start_time > datetime.now() else model.past_shows_count
+            model.query.filter(model.id == entity_id)\
+                .update({counter: counter + 1}, synchronize_session=False)
+
+    @classmethod
+    def rollover(cls, since):
+        """Refresh the counters of entities whose shows started since `since`"""
+        started = db.session.query(cls.venue_id, cls.artist_id)\
+            .filter(cls.start_time > since, cls.start_time <= datetime.now()).all()
+        Venue.refresh_show_counts({venue_id for venue_id, _ in started})
+        Artist.refresh_show_counts({artist_id for _, artist_id in started})
+        db.session.commit()
+        return len(started)
+
+    def crosses_month_boundary(self):
+        """Whether this show may overlap a show stored in another month's partition.
+
+        Such shows are checked by the shows_month_boundary trigger (migration
+        a6c2e4f81b07) under the venue and artist advisory locks.
+        """
+        month_start, next_month = month_bounds(self.start_time)
+        return self.end_time > next_month or self.start_time < month_start + MAX_SHOW_DURATION
+
+    @classmethod
+    def create_batch(cls, shows):
+        """Book a list of shows (dicts of venue_id, artist_id, start_time, end_time) in one transaction.
+
+        Either every show is booked, with a single multi-row INSERT, or none is.
+        Returns the new ids in input order and a dict of row index -> field
+        errors, one of which is always empty. A booking taken concurrently after
+        the checks raises BookingConflict.
+        """
+        shows = [cls(**show) for show in shows]
+        for show in shows:
+            if show.end_time is None:
+                show.end_time = show.start_time + DEFAULT_SHOW_DURATION
+        errors = {}
+
+        def reject(i, field, message):
+            errors.setdefault(i, {}).setdefault(field, []).append(message)
+
+        # Every referenced venue and artist, in one round trip
+        known = db.session.execute(db.union_all(
+            db.select([db.literal('venue_id'), Venue.id]).where(Venue.id.in_({show.venue_id for show in shows})),
+            db.select([db.literal('artist_id'), Artist.id]).where(Artist.id.in_({show.artist_id for show in shows}))))
+        known = set(known)
+        for i, show in enumerate(shows):
+            for field in ('venue_id', 'artist_id'):
+                if (field, getattr(show, field)) not in known:
+                    reject(i, field, f'Unknown {field[:-3]} {getattr(show, field)}')
+
+        for field in ('venue_id', 'artist_id'):
+            for i, other in batch_overlaps(shows, field):
+                reject(i, 'start_time', f'Overlaps row {other + 1} of the batch')
+        if errors:
+            return [], errors
+
+        try:
+            # The shows_month_boundary trigger's locks, taken up front in a fixed
+            # order so that two batches cannot deadlock on them
+            for kind, entity_id in sorted({lock for show in shows if show.crosses_month_boundary()
+                                           for lock in ((1, show.venue_id), (2, show.artist_id))}):
+                db.session.execute('SELECT pg_advisory_xact_lock(:kind, :id)', {'kind': kind, 'id': entity_id})
+
+            # Overlaps with booked shows, checked for the whole batch at once
+            booked = db.session.execute(db.text('''
+                SELECT batch.i - 1 FROM unnest(CAST(:venue_ids AS integer[]), CAST(:artist_ids AS integer[]),
+                                               CAST(:starts AS timestamp[]), CAST(:ends AS timestamp[]))
+                    WITH ORDINALITY AS batch(venue_id, artist_id, start_time, end_time, i)
+                WHERE EXISTS (SELECT 1 FROM shows WHERE shows.venue_id = batch.venue_id
+                              AND shows.start_time > batch.start_time - :max_duration
+                              AND shows.start_time < batch.end_time AND shows.end_time > batch.start_time)
+                   OR EXISTS (SELECT 1 FROM shows WHERE shows.artist_id = batch.artist_id
+                              AND shows.start_time > batch.start_time - :max_duration
+                              AND shows.start_time < batch.end_time AND shows.end_time > batch.start_time)
+            '''), {
+                'venue_ids': [show.venue_id for show in shows],
+                'artist_ids': [show.artist_id for show in shows],
+                'starts': [show.start_time for show in shows],
+                'ends': [show.end_time for show in shows],
+                'max_duration': MAX_SHOW_DURATION
+            })
+            for i, in booked:
+                reject(i, 'start_time', 'The venue or the artist is already booked at that time')
+            if errors:
+                db.session.rollback()
+                return [], errors
+
+            now = datetime.now()
+            table = cls.__table__
+            inserted = db.session.execute(table.insert().values([{
+                'venue_id': show.venue_id, 'artist_id': show.artist_id,
+                'start_time': show.start_time, 'end_time': show.end_time, 'updated_at': now
+            } for show in shows]).returning(table.c.start_time, table.c.venue_id, table.c.artist_id, table.c.id))
+            # RETURNING order is unspecified; a venue has one show per start time in a valid batch
+            ids_by_key = {(start_time, venue_id, artist_id): show_id
+                          for start_time, venue_id, artist_id, show_id in inserted}
+            ids = [ids_by_key[(show.start_time, show.venue_id, show.artist_id)] for show in shows]
+
+            # One counter update per venue/artist and timing, however many shows it got
+            for model, field in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+                counts = Counter((getattr(show, field), show.start_time > now) for show in shows)
+                for (entity_id, is_upcoming), count in counts.items():
+                    counter = model.upcoming_shows_count if is_upcoming else model.past_shows_count
+                    model.query.filter(model.id == entity_id)\
+                        .update({counter: counter + count}, synchronize_session=False)
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if getattr(e.orig, 'pgcode', None) == '23P01':
+                raise BookingConflict() from e
+            raise
+
+        cache.invalidate('venues', 'shows',
+                         *{f'venue:{show.venue_id}' for show in shows},
+                         *{f'artist:{show.artist_id}' for show in shows})
+        area_directory.schedule_refresh()
+        return ids, {}
+
     @classmethod
     def create(cls, data):
+        """Book a show, raising BookingConflict when the venue or the artist is taken"""
         error = False
         try:
             show = cls(**data)
+            if show.end_time is None:
+                show.end_time = show.start_time + DEFAULT_SHOW_DURATION
             db.session.add(show)
+            show.increment_show_counts()
             db.session.commit()
-            
+            cache.invalidate(f'venue:{show.venue_id}', f'artist:{show.artist_id}', 'venues', 'shows')
+            area_directory.schedule_refresh()
+
+        except IntegrityError as e:
+            db.session.rollback()
+            # 23P01: exclusion_violation, raised by the booking constraints and trigger
+            if getattr(e.orig, 'pgcode', None) == '23P01':
+                raise BookingConflict() from e
+            print(sys.exc_info())
+            error = True
+
         except:
             print(sys.exc_info())
             error = True
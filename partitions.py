@@ -0,0 +1,100 @@
+"""Maintenance of the monthly range partitions of the shows table.
+
+Partitions are named shows_YYYY_MM. Shows outside every monthly partition
+land in shows_default, so keep partitions created ahead of new bookings.
+
+Postgres cannot put an exclusion constraint on a partitioned table, so every
+partition carries its own pair of booking constraints (see
+add_booking_constraints); the shows_month_boundary trigger on the parent
+covers the shows running across two months.
+"""
+from datetime import date
+
+from models import db, record_deletion, Venue, Artist
+
+PREFIX = 'shows_'
+
+
+def month_start(day, months=0):
+    """First day of the month `months` after the month of `day`"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PREFIX}{month:%Y_%m}'
+
+
+def add_booking_constraints(name):
+    """Reject overlapping shows of a venue or an artist within partition `name` (needs btree_gist)"""
+    for column in ('venue_id', 'artist_id'):
+        db.session.execute(
+            f'ALTER TABLE {name} ADD CONSTRAINT {name}_{column}_no_overlap '
+            f'EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def monthly_partitions():
+    """Names of the attached monthly partitions, oldest first"""
+    rows = db.session.execute('''
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'shows' AND child.relname <> 'shows_default'
+        ORDER BY child.relname
+    ''')
+    return [name for name, in rows]
+
+
+def create_partitions(months_ahead=12, today=None):
+    """Make sure a partition exists for this month and the next `months_ahead` months.
+
+    Shows booked beyond the window wait in shows_default; Postgres refuses a
+    new partition whose range the default partition holds rows of, so those
+    rows are moved into it within the same transaction.
+    """
+    today = today or date.today()
+    existing = set(monthly_partitions())
+    created = []
+    for months in range(months_ahead + 1):
+        month = month_start(today, months)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        bounds = {'start': month, 'end': month_start(month, 1)}
+        # Keep bookings from reaching shows_default until the partition exists
+        db.session.execute('LOCK TABLE shows_default IN SHARE ROW EXCLUSIVE MODE')
+        db.session.execute('CREATE TEMPORARY TABLE shows_moving (LIKE shows_default) ON COMMIT DROP')
+        db.session.execute('''
+            WITH moved AS (DELETE FROM shows_default WHERE start_time >= :start AND start_time < :end RETURNING *)
+            INSERT INTO shows_moving SELECT * FROM moved
+        ''', bounds)
+        db.session.execute(
+            f"CREATE TABLE {name} PARTITION OF shows FOR VALUES FROM ('{month}') TO ('{bounds['end']}')")
+        add_booking_constraints(name)
+        db.session.execute(f'INSERT INTO {name} SELECT * FROM shows_moving')
+        db.session.execute('DROP TABLE shows_moving')
+        created.append(name)
+    db.session.commit()
+    return created
+
+
+def archive_partitions(before, drop=False):
+    """Detach the monthly partitions entirely older than the month of `before`.
+
+    Detached partitions are kept as standalone archive tables unless `drop`
+    is set. Venue and artist show counters are recomputed afterwards.
+    """
+    cutoff = partition_name(month_start(before))
+    archived = [name for name in monthly_partitions() if name < cutoff]
+    for name in archived:
+        db.session.execute(f'ALTER TABLE shows DETACH PARTITION {name}')
+        if drop:
+            db.session.execute(f'DROP TABLE {name}')
+        else:
+            db.session.execute(f'ALTER TABLE {name} RENAME TO archived_{name}')
+    if archived:
+        record_deletion('shows')
+        Venue.refresh_show_counts()
+        Artist.refresh_show_counts()
+    db.session.commit()
+    return archived
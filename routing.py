@@ -0,0 +1,72 @@
+from functools import wraps
+import random
+import time
+
+from flask import g, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+
+
+def read_only(view):
+    """Mark a view as read-only so its queries may go to a replica"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def use_replica():
+    """Read-only requests go to a replica, unless this client wrote recently.
+
+    A write pins the client to the primary for REPLICA_LAG_SECONDS so the page
+    it is redirected to after an edit reflects the edit (read-your-writes).
+    """
+    if not has_request_context() or not g.get('read_only'):
+        return False
+    return session.get('primary_until', 0) < time.time()
+
+
+class RoutingSession(SignallingSession):
+    """Sends reads of read-only requests to a random replica, everything else to the primary"""
+
+    def __init__(self, db, *args, **kwargs):
+        self.db = db
+        super().__init__(db, *args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None):
+        replicas = self.app.config.get('SQLALCHEMY_REPLICA_BINDS')
+        if replicas and not self._flushing and use_replica():
+            return self.db.get_engine(self.app, bind=random.choice(replicas))
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def remember_flush(session_, flush_context):
+    if has_request_context():
+        g.wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy with replicas from SQLALCHEMY_REPLICA_URIS registered as binds"""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {}) or {}
+        replicas = []
+        for i, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS') or []):
+            binds[f'replica_{i}'] = uri
+            replicas.append(f'replica_{i}')
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.config['SQLALCHEMY_REPLICA_BINDS'] = replicas
+        super().init_app(app)
+
+        lag = app.config.get('REPLICA_LAG_SECONDS', 5)
+
+        @app.after_request
+        def pin_to_primary(response):
+            if g.get('wrote'):
+                session['primary_until'] = time.time() + lag
+            return response
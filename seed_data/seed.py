@@ -1,31 +1,20 @@
-import psycopg2
+"""Load the bundled sample data: python seed_data/seed.py"""
+import os
+import sys
 
-con = psycopg2.connect("dbname=fyyur user=postgres password=postgres")
+seed_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(seed_dir))
 
-cur = con.cursor()
+from app import create_app
+from geocode import geocode_venues
+from importer import import_file
 
-cur.execute('''
-    COPY artists(id, name, genres, city, state, phone, website, facebook_link, seeking_venue, seeking_description, image_link)
-    FROM '/mnt/e/code/udacity-fyyur/seed_data/artists.csv' 
-    DELIMITER ',' 
-    CSV HEADER;
-''')
-
-cur.execute('''
-    COPY venues(id, name, genres, address, city, state, phone, website, facebook_link, seeking_talent, seeking_description, image_link)
-    FROM '/mnt/e/code/udacity-fyyur/seed_data/venues.csv' 
-    DELIMITER ',' 
-    CSV HEADER;
-''')
-
-cur.execute('''
-    COPY shows(venue_id, artist_id, start_time)
-    FROM '/mnt/e/code/udacity-fyyur/seed_data/shows.csv' 
-    DELIMITER ',' 
-    CSV HEADER;
-''')
-
-con.commit()
-con.close()
-cur.close()
+app = create_app()
 
+with app.app_context():
+    # Venues and artists first so the shows' foreign keys resolve
+    for entity in ('venues', 'artists', 'shows'):
+        imported, rejected = import_file(entity, os.path.join(seed_dir, f'{entity}.csv'))
+        print(f'{imported} {entity} imported, {rejected} rejected')
+    located, unknown = geocode_venues(os.path.join(seed_dir, 'gazetteer.csv'))
+    print(f'{located} venues geocoded')
@@ -0,0 +1,126 @@
+"""Offline artist similarity: top-k related artists by cosine similarity.
+
+Artists are described by the genres they play (artist x genre) and the venues
+they have played (artist x venue, show counts damped with log1p). Both sparse
+matrices are row-normalized, weighted and stacked, and each artist's top_k
+neighbours by cosine similarity are stored in artist_similarities.
+
+Needs numpy and scipy, which nothing but this job imports.
+
+    flask compute-similar-artists          # artists touched since the last run
+    flask compute-similar-artists --full
+"""
+from datetime import datetime
+
+from models import db, artist_genres, artist_similarities, job_run, job_runs, Artist, Show, SIMILARITY_JOB
+
+# Relative importance of sharing genres and sharing venues
+GENRE_WEIGHT = 0.4
+VENUE_WEIGHT = 0.6
+
+# Artists scored per sparse matrix product, bounds memory on large catalogues
+CHUNK_SIZE = 1000
+
+
+def normalize_rows(matrix):
+    import numpy as np
+    from scipy import sparse
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return sparse.diags(scale) @ matrix
+
+
+def cooccurrence(rows, position):
+    """Sparse artist x column matrix from (artist_id, column_key, value) rows"""
+    import numpy as np
+    from scipy import sparse
+    columns, data, row_index, column_index = {}, [], [], []
+    for artist_id, key, value in rows:
+        row_index.append(position[artist_id])
+        column_index.append(columns.setdefault(key, len(columns)))
+        data.append(value)
+    return sparse.csr_matrix((np.array(data, dtype=float), (row_index, column_index)),
+                             shape=(len(position), max(len(columns), 1)))
+
+
+def feature_matrix():
+    """(artist ids, unit-length feature rows) for every artist"""
+    import numpy as np
+    from scipy import sparse
+    artist_ids = np.array([artist_id for artist_id, in db.session.query(Artist.id).order_by(Artist.id)])
+    position = {artist_id: i for i, artist_id in enumerate(artist_ids)}
+
+    genres = cooccurrence(
+        ((artist_id, genre_id, 1.0) for artist_id, genre_id in db.session.query(
+            artist_genres.c.artist_id, artist_genres.c.genre_id)), position)
+    venues = cooccurrence(
+        ((artist_id, venue_id, np.log1p(count)) for artist_id, venue_id, count in db.session.query(
+            Show.artist_id, Show.venue_id, db.func.count()).group_by(Show.artist_id, Show.venue_id)), position)
+
+    features = sparse.hstack([GENRE_WEIGHT * normalize_rows(genres), VENUE_WEIGHT * normalize_rows(venues)])
+    return artist_ids, normalize_rows(features.tocsr()).tocsr()
+
+
+def top_similar(artist_ids, features, rows, top_k):
+    """Yield (artist_id, similar_artist_id, rank, score) for the artists at `rows`"""
+    import numpy as np
+    transposed = features.T.tocsc()
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        scores = (features[chunk] @ transposed).tocsr()
+        for offset, row in enumerate(chunk):
+            begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+            columns, values = scores.indices[begin:end], scores.data[begin:end]
+            keep = (columns != row) & (values > 0)
+            columns, values = columns[keep], values[keep]
+            if len(values) > top_k:
+                best = np.argpartition(-values, top_k)[:top_k]
+                columns, values = columns[best], values[best]
+            order = np.lexsort((artist_ids[columns], -values))
+            for rank, i in enumerate(order, start=1):
+                yield int(artist_ids[row]), int(artist_ids[columns[i]]), rank, float(values[i])
+
+
+def touched_artists(since):
+    """Artists edited or booked since `since`, and the artists listing them as similar"""
+    touched = {artist_id for artist_id, in db.session.query(Artist.id).filter(Artist.updated_at > since)}
+    touched |= {artist_id for artist_id, in db.session.query(Show.artist_id).filter(Show.updated_at > since).distinct()}
+    if touched:
+        touched |= {artist_id for artist_id, in db.session.query(artist_similarities.c.artist_id)
+                    .filter(artist_similarities.c.similar_artist_id.in_(touched)).distinct()}
+    return touched
+
+
+def compute(top_k=10, full=False, batch_size=10000):
+    """Recompute the similar artists of touched artists (or of all with `full`).
+
+    The first run is always a full one. Changes made while the job runs are
+    picked up by the next run. Returns the number of artists recomputed.
+    """
+    started = datetime.now()
+    since = None if full else db.session.query(job_runs.c.started_at)\
+        .filter(job_runs.c.name == SIMILARITY_JOB).scalar()
+
+    artist_ids, features = feature_matrix()
+    if since is None:
+        rows = list(range(len(artist_ids)))
+        db.session.execute(artist_similarities.delete())
+    else:
+        touched = touched_artists(since)
+        rows = [i for i, artist_id in enumerate(artist_ids) if artist_id in touched]
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(artist_similarities.delete().where(artist_similarities.c.artist_id.in_(
+                [int(artist_ids[row]) for row in rows[start:start + batch_size]])))
+
+    batch = []
+    for artist_id, similar_id, rank, score in top_similar(artist_ids, features, rows, top_k):
+        batch.append({'artist_id': artist_id, 'similar_artist_id': similar_id, 'rank': rank, 'score': score})
+        if len(batch) >= batch_size:
+            db.session.execute(artist_similarities.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(artist_similarities.insert(), batch)
+
+    db.session.execute(job_run(SIMILARITY_JOB, started))
+    db.session.commit()
+    return len(rows)
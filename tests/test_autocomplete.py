@@ -0,0 +1,59 @@
+"""PrefixIndex, exercised without a database: built by hand, then kept by add/remove."""
+from autocomplete import PrefixIndex, word_suffixes
+
+
+def make_index(**names):
+    index = PrefixIndex()
+    index.built = True
+    for kind, entities in names.items():
+        for entity_id, name in entities.items():
+            index.add(kind, entity_id, name)
+    return index
+
+
+def test_word_suffixes():
+    assert word_suffixes('The Musical  Hop') == ['the musical  hop', 'musical  hop', 'hop']
+    assert word_suffixes(None) == []
+
+
+def test_search_matches_any_word_in_key_order():
+    index = make_index(venue={1: 'The Musical Hop', 2: 'Hopscotch Hall', 3: 'Park Square'},
+                       artist={7: 'Guns N Petals'})
+    results = index.search('  HOP ')
+    # 'hop' sorts before 'hopscotch hall'
+    assert list(results['venue'].items()) == [(1, 'The Musical Hop'), (2, 'Hopscotch Hall')]
+    assert results['artist'] == {}
+    assert index.search('pet')['artist'] == {7: 'Guns N Petals'}
+    assert index.search('') == {'venue': {}, 'artist': {}}
+
+
+def test_search_limit_applies_per_kind():
+    index = make_index(venue={i: f'Hall {i}' for i in range(5)}, artist={1: 'Hall Of Fame'})
+    results = index.search('hall', limit=2)
+    assert len(results['venue']) == 2
+    assert results['artist'] == {1: 'Hall Of Fame'}
+
+
+def test_a_name_matched_by_two_words_is_listed_once():
+    index = make_index(venue={1: 'Hop Hop'})
+    assert index.search('hop') == {'venue': {1: 'Hop Hop'}, 'artist': {}}
+
+
+def test_add_replaces_the_previous_name():
+    index = make_index(artist={4: 'Matt Quevedo'})
+    index.add('artist', 4, 'The Wild Sax Band')
+    assert index.search('matt')['artist'] == {}
+    assert index.search('sax')['artist'] == {4: 'The Wild Sax Band'}
+
+
+def test_remove():
+    index = make_index(venue={1: 'The Dueling Pianos Bar', 2: 'The Musical Hop'})
+    index.remove('venue', 1)
+    index.remove('venue', 99)
+    assert index.search('the')['venue'] == {2: 'The Musical Hop'}
+
+
+def test_add_is_ignored_until_built():
+    index = PrefixIndex()
+    index.add('venue', 1, 'The Musical Hop')
+    assert index.search('hop')['venue'] == {}
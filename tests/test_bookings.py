@@ -0,0 +1,50 @@
+"""Booking rules enforced by the database.
+
+Needs a PostgreSQL database migrated to head (flask db upgrade), named by
+TEST_DATABASE_URL; skipped otherwise. Nothing is committed.
+
+    TEST_DATABASE_URL=postgresql://localhost/fyyur_test python -m pytest tests
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+
+@pytest.fixture
+def session():
+    from app import create_app
+    from models import db
+    app = create_app({'SQLALCHEMY_DATABASE_URI': DATABASE_URL, 'TESTING': True})
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+
+
+def insert(session, table, **values):
+    columns = ', '.join(values)
+    placeholders = ', '.join(f':{name}' for name in values)
+    return session.execute(f'INSERT INTO {table} ({columns}) VALUES ({placeholders}) RETURNING id',
+                           values).scalar()
+
+
+def test_overlap_across_month_boundary_is_rejected(session):
+    from sqlalchemy.exc import IntegrityError
+    # Both months have partitions: create_partitions keeps a year ahead
+    now = datetime.now()
+    next_month = datetime(now.year + now.month // 12, now.month % 12 + 1, 1)
+    venue_id = insert(session, 'venues', name='Boundary Hall')
+    first_artist = insert(session, 'artists', name='Late Set')
+    second_artist = insert(session, 'artists', name='Early Set')
+
+    # 23:00 on the last day of the month until 02:00, stored in this month's partition
+    insert(session, 'shows', venue_id=venue_id, artist_id=first_artist,
+           start_time=next_month - timedelta(hours=1), end_time=next_month + timedelta(hours=2))
+    # 01:00 on the first, stored in next month's partition
+    with pytest.raises(IntegrityError) as error:
+        insert(session, 'shows', venue_id=venue_id, artist_id=second_artist,
+               start_time=next_month + timedelta(hours=1), end_time=next_month + timedelta(hours=3))
+    assert error.value.orig.pgcode == '23P01'
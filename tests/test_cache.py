@@ -0,0 +1,40 @@
+"""LRUBackend, the in-process cache backend."""
+import pytest
+
+pytest.importorskip('flask')
+from cache import LRUBackend  # noqa: E402
+
+
+def test_least_recently_used_entry_is_evicted():
+    backend = LRUBackend(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=60)
+    assert backend.get('a') == 1  # 'b' is now the least recently used
+    backend.set('c', 3, ttl=60)
+    assert backend.get('b') is None
+    assert (backend.get('a'), backend.get('c')) == (1, 3)
+
+
+def test_overwriting_refreshes_an_entry():
+    backend = LRUBackend(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=60)
+    backend.set('a', 10, ttl=60)
+    backend.set('c', 3, ttl=60)
+    assert backend.get('b') is None
+    assert backend.get('a') == 10
+
+
+def test_expired_entry_is_a_miss():
+    backend = LRUBackend()
+    backend.set('a', 1, ttl=-1)
+    assert backend.get('a') is None
+    assert 'a' not in backend.entries
+
+
+def test_delete_prefix():
+    backend = LRUBackend()
+    for key in ('venue:1', 'venue:2', 'venues'):
+        backend.set(key, key, ttl=60)
+    backend.delete_prefix('venue:')
+    assert [backend.get(key) for key in ('venue:1', 'venue:2', 'venues')] == [None, None, 'venues']
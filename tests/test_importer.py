@@ -0,0 +1,96 @@
+"""importer.clean and read_csv: normalization and rejection of raw records."""
+import io
+
+import pytest
+
+pytest.importorskip('flask_wtf')
+pytest.importorskip('dateutil')
+pytest.importorskip('flask_sqlalchemy')
+from datetime import datetime  # noqa: E402
+
+from flask import Flask  # noqa: E402
+
+import importer  # noqa: E402
+
+VENUE = {'name': 'The Musical Hop', 'genres': 'Jazz,Folk', 'address': '1015 Folsom Street',
+         'city': 'San Francisco', 'state': 'CA', 'phone': '123-123-1234',
+         'website': 'https://www.themusicalhop.com', 'facebook_link': 'https://www.facebook.com/TheMusicalHop',
+         'seeking_talent': 'yes', 'seeking_description': '', 'image_link': '',
+         'latitude': '37.7749', 'longitude': '-122.4194'}
+SHOW = {'venue_id': '1', 'artist_id': '4', 'start_time': '2030-05-21T21:30:00'}
+
+
+@pytest.fixture(autouse=True)
+def app_context():
+    # The forms read their settings from the current app
+    with Flask(__name__).app_context():
+        yield
+
+
+def clean(entity, **changes):
+    record = dict(VENUE if entity == 'venues' else SHOW, **changes)
+    return importer.clean(entity, record)
+
+
+def test_valid_venue():
+    values, errors = clean('venues')
+    assert errors == {}
+    assert values['genres'] == ['Jazz', 'Folk']
+    assert values['seeking_talent'] is True
+    assert (values['latitude'], values['longitude']) == (37.7749, -122.4194)
+    assert values['image_link'] is None
+
+
+@pytest.mark.parametrize('blank', ['', '  ', 'NULL', None])
+def test_blank_values_are_null(blank):
+    values, errors = clean('venues', phone=blank, website=blank)
+    assert errors == {}
+    assert values['phone'] is None and values['website'] is None
+
+
+def test_blank_required_field_is_rejected():
+    _, errors = clean('venues', name='NULL')
+    assert list(errors) == ['name']
+
+
+@pytest.mark.parametrize('name, value', [('latitude', '90.5'), ('longitude', '-181'), ('latitude', 'north')])
+def test_coordinates_out_of_bounds(name, value):
+    values, errors = clean('venues', **{name: value})
+    assert values is None
+    assert errors == {name: ['Not a valid coordinate']}
+
+
+def test_genres_must_be_strings():
+    assert clean('venues', genres=['Jazz', 3]) == (None, {'genres': ['Not a valid list of genres']})
+
+
+def test_show_end_time_defaults():
+    values, errors = clean('shows')
+    assert errors == {}
+    assert (values['venue_id'], values['artist_id']) == (1, 4)
+    assert values['end_time'] - values['start_time'] == importer.DEFAULT_SHOW_DURATION
+
+
+@pytest.mark.parametrize('value', ['not a date', '2030-13-45', 20300521, True, ['2030-05-21'], {'at': 'now'}])
+def test_invalid_datetimes(value):
+    assert clean('shows', start_time=value) == (None, {'start_time': ['Not a valid datetime value']})
+
+
+def test_datetime_objects_lose_their_timezone():
+    from datetime import timezone
+    values, errors = clean('shows', start_time=datetime(2030, 5, 21, 21, 30, tzinfo=timezone.utc))
+    assert errors == {}
+    assert values['start_time'] == datetime(2030, 5, 21, 21, 30)
+
+
+def test_show_ids_must_be_integers():
+    _, errors = clean('shows', venue_id='one')
+    assert errors == {'venue_id': ['Not a valid id']}
+
+
+def test_csv_row_with_extra_fields_is_rejected():
+    rows = list(importer.read_csv(io.StringIO('venue_id, artist_id, start_time\n'
+                                              '1,4,2030-05-21 21:30\n'
+                                              '1,4,2030-05-21 21:30,oops,again\n')))
+    assert rows[0] == {'venue_id': '1', 'artist_id': '4', 'start_time': '2030-05-21 21:30'}
+    assert importer.clean('shows', rows[1]) == (None, {'row': ['2 more field(s) than the header']})
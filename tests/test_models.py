@@ -0,0 +1,60 @@
+"""Model helpers that need no database: keyset cursors and the batch overlap sweep."""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+pytest.importorskip('flask_migrate')
+from werkzeug.exceptions import BadRequest  # noqa: E402
+
+from models import Artist, Show, batch_overlaps, decode_cursor, encode_cursor  # noqa: E402
+
+EIGHT_PM = datetime(2030, 5, 1, 20, 0)
+
+
+def test_cursor_round_trip():
+    keys = [Show.start_time, Show.id]
+    assert decode_cursor(encode_cursor([EIGHT_PM, 42]), keys) == (EIGHT_PM, 42)
+
+
+def test_cursor_of_a_null_key():
+    assert decode_cursor(encode_cursor([None, 3]), [Artist.name, Artist.id]) == (None, 3)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    encode_cursor([1, 2])[:-4],             # truncated
+    encode_cursor([EIGHT_PM]),              # too few values
+    encode_cursor([EIGHT_PM, 42, 1]),       # too many
+    encode_cursor(['yesterday', 42]),       # not an isoformat datetime
+    encode_cursor([EIGHT_PM, '42']),        # id of the wrong type
+    'eyJzdGFydCI6IDF9',                     # a JSON object, not a list
+])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(BadRequest):
+        decode_cursor(cursor, [Show.start_time, Show.id])
+
+
+def show(venue_id, artist_id, start, hours=2):
+    start_time = EIGHT_PM + timedelta(hours=start)
+    return SimpleNamespace(venue_id=venue_id, artist_id=artist_id,
+                           start_time=start_time, end_time=start_time + timedelta(hours=hours))
+
+
+def test_batch_overlaps_per_venue():
+    shows = [show(1, 10, 0), show(1, 11, 1), show(2, 12, 1), show(1, 13, 2)]
+    # Row 3 starts as row 0 ends (back to back is fine) but overlaps row 1
+    assert sorted(batch_overlaps(shows, 'venue_id')) == [(1, 0), (3, 1)]
+    assert list(batch_overlaps(shows, 'artist_id')) == []
+
+
+def test_batch_overlaps_with_a_long_earlier_show():
+    # The short show in between ends first; the long one still covers the last
+    shows = [show(1, 10, 5, hours=1), show(1, 10, 0, hours=8), show(1, 10, 7, hours=1)]
+    assert sorted(batch_overlaps(shows, 'artist_id')) == [(0, 1), (2, 1)]
+
+
+def test_batch_overlaps_ignore_input_order():
+    shows = [show(1, 10, 1), show(1, 10, 0)]
+    assert list(batch_overlaps(shows, 'venue_id')) == [(0, 1)]